@@ -1,8 +1,22 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 import torch
-from transformers import RobertaTokenizerFast, RobertaForTokenClassification
+from transformers import RobertaTokenizerFast
+import hmac
 import os
+import threading
+import time
+
+from backends import artifact_version, is_model_dir, load_backend
+from batching import AdmissionRejected, MicroBatcher
+from inference import compute_jargon_score, detect_jargon_batch_with_model
+from glossary_store import GlossaryStore
+from cascade import needs_model
+from incremental import DraftSessions, detect_incremental
+from rewriter import rewrite_with_glossary
+from result_cache import ResultCache, make_cache_key
+from matcher import GlossaryMatcherCache, TermMatcher, glossary_fingerprint, merge_spans
+from metrics import MetricsRegistry
 
 app = Flask(__name__)
 CORS(app)
@@ -11,255 +25,755 @@ CORS(app)
 jargon_model = None
 jargon_tokenizer = None
 device = None
+model_version = 'rule-based'
 
-def load_jargon_model():
-    """Load the fine-tuned jargon detection model"""
-    global jargon_model, jargon_tokenizer, device
-    
+# The model requests are scored with; replaced as a whole on reload
+active_model = None
+
+# Requests are answered by the rule-based detector until the model is ready
+MODEL_LOADED = False
+model_state = 'loading'
+
+# Long texts are scored in overlapping windows rather than truncated;
+# set JARGON_WINDOW_TOKENS=0 to go back to truncating at 512 tokens
+WINDOW_TOKENS = min(int(os.environ.get('JARGON_WINDOW_TOKENS', '512')), 512)
+WINDOW_STRIDE = int(os.environ.get('JARGON_WINDOW_STRIDE', '128'))
+if WINDOW_TOKENS and not 0 <= WINDOW_STRIDE < WINDOW_TOKENS - 2:
+    raise ValueError("JARGON_WINDOW_STRIDE must be smaller than JARGON_WINDOW_TOKENS")
+
+WARMUP_TEXTS = [
+    "Let's circle back on the KPIs before the standup.",
+    "The meeting is scheduled for tomorrow at 3 PM."
+]
+
+class LoadedModel:
+    """A warmed-up model with its tokenizer, swapped in as one unit"""
+
+    def __init__(self, tokenizer, model, device, version, model_path, tokenizer_path, backend):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.device = device
+        self.version = version
+        self.model_path = model_path
+        self.tokenizer_path = tokenizer_path
+        self.backend = backend
+
+def model_settings():
+    """Model, tokenizer and backend configured through the environment"""
+    # Paths to your fine-tuned model; prefer the self-contained model directory
+    # written by train_jargon_model.py over legacy state dict weights
+    default_model_path = './jargon_model' if is_model_dir('./jargon_model') else 'best_jargon_model.pt'
+    return {
+        'model_path': os.environ.get('JARGON_MODEL_PATH', default_model_path),
+        'tokenizer_path': os.environ.get('JARGON_TOKENIZER_PATH', './jargon_model'),
+        'backend': os.environ.get('JARGON_BACKEND', 'torch')
+    }
+
+def load_jargon_model(model_path, tokenizer_path, backend):
+    """Load the fine-tuned jargon detection model and warm it up"""
     # Set device
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    print(f"Using device: {device}")
-    
-    # Paths to your fine-tuned model
-    model_path = os.environ.get('JARGON_MODEL_PATH', 'best_jargon_model.pt')
-    tokenizer_path = os.environ.get('JARGON_TOKENIZER_PATH', './jargon_model')
+    target_device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print(f"Using device: {target_device}")
+    onnx_path = os.environ.get('JARGON_ONNX_PATH')
     
     try:
         # Load tokenizer
         print(f"Loading tokenizer from {tokenizer_path}...")
-        jargon_tokenizer = RobertaTokenizerFast.from_pretrained(tokenizer_path)
-        
-        # Load model
-        print(f"Loading model from {model_path}...")
-        jargon_model = RobertaForTokenClassification.from_pretrained(
-            'roberta-base',
-            num_labels=2  # 0: Non-jargon, 1: Jargon
-        )
+        tokenizer = RobertaTokenizerFast.from_pretrained(tokenizer_path)
         
-        # Load the fine-tuned weights
-        state_dict = torch.load(model_path, map_location=device)
-        jargon_model.load_state_dict(state_dict)
+        # Load model with the configured inference backend
+        print(f"Loading model from {model_path} ({backend} backend)...")
+        model, model_device = load_backend(backend, model_path, target_device, onnx_path)
         
-        # Move model to device and set to evaluation mode
-        jargon_model.to(device)
-        jargon_model.eval()
+        # Run a first pass so lazy initialisation doesn't land on a request
+        print("Warming up model...")
+        detect_jargon_batch_with_model(
+            WARMUP_TEXTS, tokenizer, model, model_device,
+            window=WINDOW_TOKENS, stride=WINDOW_STRIDE
+        )
         
-        print("Model loaded successfully!")
-        return True
+        artifact = getattr(model, 'onnx_path', model_path)
+        version = f"{artifact_version(artifact)}:{backend}"
+        print(f"Model {version} loaded successfully!")
+        return LoadedModel(tokenizer, model, model_device, version, model_path, tokenizer_path, backend)
         
     except FileNotFoundError as e:
         print(f"Error: Model files not found - {e}")
         print("Please ensure you have:")
         print(f"  1. Model weights at: {model_path}")
         print(f"  2. Tokenizer files at: {tokenizer_path}")
-        print("\nFalling back to rule-based detection...")
-        return False
+        return None
     except Exception as e:
         print(f"Error loading model: {e}")
-        print("Falling back to rule-based detection...")
-        return False
+        return None
 
-# Try to load model on startup
-MODEL_LOADED = load_jargon_model()
+def activate_model(loaded):
+    """
+    Make `loaded` the model new requests are scored with.
+    
+    Inference takes the active model once per batch, so batches already
+    running finish on the model they started with.
+    """
+    global active_model, jargon_model, jargon_tokenizer, device, model_version
+    global MODEL_LOADED, model_state
+    
+    active_model = loaded
+    jargon_tokenizer, jargon_model, device = loaded.tokenizer, loaded.model, loaded.device
+    model_version = loaded.version
+    MODEL_LOADED = True
+    model_state = 'ready'
 
-def detect_jargon_with_model(text, tokenizer, model, device):
-    """Detect jargon using the fine-tuned model"""
-    # Tokenize
-    encoding = tokenizer(
-        text,
-        return_tensors='pt',
-        return_offsets_mapping=True,
-        padding=True,
-        truncation=True,
-        max_length=512
+def start_model_loading():
+    """Load the model in a background thread, or inline with JARGON_LAZY_LOAD=0"""
+    def load():
+        global model_state
+        loaded = load_jargon_model(**model_settings())
+        if loaded is not None:
+            activate_model(loaded)
+        else:
+            print("Falling back to rule-based detection...")
+            model_state = 'failed'
+    
+    if os.environ.get('JARGON_LAZY_LOAD', '1') == '0':
+        load()
+    else:
+        threading.Thread(target=load, name='jargon-model-loader', daemon=True).start()
+
+def has_tokenizer(path):
+    return any(
+        os.path.isfile(os.path.join(path, name))
+        for name in ('tokenizer.json', 'tokenizer_config.json', 'vocab.json')
     )
+
+# Hot reloading: one reload at a time, loaded and warmed up next to the
+# active model before being swapped in
+reload_lock = threading.Lock()
+reload_status = {'state': 'idle', 'target': None, 'error': None}
+
+def reload_model(model_path=None, tokenizer_path=None, backend=None, wait=False):
+    """
+    Load a model in the background and swap it in once it is warmed up.
     
-    input_ids = encoding['input_ids'].to(device)
-    attention_mask = encoding['attention_mask'].to(device)
-    offset_mapping = encoding['offset_mapping'][0]
+    Arguments left out keep those of the active model (or the configured
+    settings), so new weights written over the current model directory are
+    picked up as a new version. A new `model_path` brings its own tokenizer
+    when it has tokenizer files. A failed reload leaves the active model
+    serving.
     
-    # Get predictions
-    with torch.no_grad():
-        outputs = model(input_ids=input_ids, attention_mask=attention_mask)
-        predictions = torch.argmax(outputs.logits, dim=-1)[0]
-        probs = torch.softmax(outputs.logits, dim=-1)[0]
+    Returns:
+        False if a reload is already in progress, else True
+    """
+    if not reload_lock.acquire(blocking=False):
+        return False
     
-    # Extract jargon spans
-    jargon_spans = []
-    current_span = None
+    current = active_model
+    if current is not None:
+        settings = {
+            'model_path': current.model_path,
+            'tokenizer_path': current.tokenizer_path,
+            'backend': current.backend
+        }
+    else:
+        settings = model_settings()
+    if model_path:
+        settings['model_path'] = model_path
+        if has_tokenizer(model_path):
+            settings['tokenizer_path'] = model_path
+    if tokenizer_path:
+        settings['tokenizer_path'] = tokenizer_path
+    if backend:
+        settings['backend'] = backend
+    reload_status.update(state='loading', target=settings, error=None)
     
-    for i, (pred, prob, (start, end)) in enumerate(zip(predictions, probs, offset_mapping)):
-        # Skip special tokens
-        if start == 0 and end == 0:
-            continue
-        
-        if pred == 1:  # Jargon detected
-            confidence = prob[1].item()
-            
-            if current_span is None:
-                current_span = {
-                    'start': int(start),
-                    'end': int(end),
-                    'confidence': confidence
-                }
+    def load():
+        try:
+            loaded = load_jargon_model(**settings)
+            if loaded is None:
+                reload_status.update(state='failed', error='Model could not be loaded; see logs')
             else:
-                # Extend current span
-                current_span['end'] = int(end)
-                current_span['confidence'] = max(current_span['confidence'], confidence)
-        else:
-            # End of jargon span
-            if current_span is not None:
-                term = text[current_span['start']:current_span['end']]
-                jargon_spans.append({
-                    'start': current_span['start'],
-                    'end': current_span['end'],
-                    'confidence': current_span['confidence'],
-                    'term': term,
-                    'suggestion': f'Consider simplifying "{term}"'
-                })
-                current_span = None
-    
-    # Don't forget the last span if it exists
-    if current_span is not None:
-        term = text[current_span['start']:current_span['end']]
-        jargon_spans.append({
-            'start': current_span['start'],
-            'end': current_span['end'],
-            'confidence': current_span['confidence'],
-            'term': term,
-            'suggestion': f'Consider simplifying "{term}"'
-        })
+                activate_model(loaded)
+                reload_status.update(state='idle', error=None)
+        finally:
+            reload_lock.release()
     
-    return jargon_spans
+    if wait:
+        load()
+    else:
+        threading.Thread(target=load, name='jargon-model-reloader', daemon=True).start()
+    return True
 
-def detect_jargon_rule_based(text):
-    """Fallback rule-based jargon detection"""
-    # Common business jargon patterns
-    jargon_terms = [
-        'KPI', 'KPIs', 'OKR', 'OKRs', 'MRR', 'ARR', 'CAC', 'LTV',
-        'synerg', 'leverage', 'bandwidth', 'circle back', 'touch base',
-        'deep dive', 'drill down', 'move the needle', 'low-hanging fruit',
-        'paradigm shift', 'core competenc', 'best practice', 'value-add',
-        'deliverable', 'action item', 'stakeholder', 'think outside the box',
-        'take it offline', 'boil the ocean', 'ballpark', 'ping',
-        'deck', 'standup', 'sprint', 'velocity', 'north star metric',
-        'unit economics', 'burn rate', 'runway'
-    ]
+# With JARGON_MODEL_WATCH_SECONDS set, each process polls the active model's
+# files and reloads once a new version has stopped changing
+MODEL_WATCH_SECONDS = float(os.environ.get('JARGON_MODEL_WATCH_SECONDS', '0'))
+_model_watch_pid = None
+
+def start_model_watch():
+    """Start polling for new model versions in this process (safe to repeat)"""
+    global _model_watch_pid
+    if not MODEL_WATCH_SECONDS or _model_watch_pid == os.getpid():
+        return
+    _model_watch_pid = os.getpid()
+    
+    def watch():
+        seen = None
+        failed = None
+        while True:
+            time.sleep(MODEL_WATCH_SECONDS)
+            current = active_model
+            if current is None:
+                continue
+            try:
+                version = artifact_version(getattr(current.model, 'onnx_path', current.model_path))
+            except OSError:
+                continue
+            # Wait for two identical readings so a file still being written
+            # isn't loaded, and retry a version that failed only once its
+            # files change again
+            if current.version.startswith(version + ':') or version == failed or version != seen:
+                seen = version
+                continue
+            print(f"New model version {version} found, reloading...")
+            if reload_model(wait=True) and reload_status['state'] == 'failed':
+                print(f"Model version {version} failed to load; waiting for new files")
+                failed = version
+            seen = None
+    
+    threading.Thread(target=watch, name='jargon-model-watch', daemon=True).start()
+
+# Prometheus metrics served on /metrics
+metrics = MetricsRegistry()
+request_seconds = metrics.histogram(
+    'jargon_request_seconds', 'Time to answer a request', labelnames=('endpoint',)
+)
+stage_seconds = metrics.histogram(
+    'jargon_stage_seconds', 'Time spent in each stage of detection', labelnames=('stage',)
+)
+model_batch_size = metrics.histogram(
+    'jargon_model_batch_size', 'Texts or windows per forward pass',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+window_tokens = metrics.histogram(
+    'jargon_window_tokens', 'Tokens per window scored by the model',
+    buckets=(16, 32, 64, 128, 256, 384, 512)
+)
+rule_based_total = metrics.counter(
+    'jargon_rule_based_total', 'Texts answered by the rule-based detector', ('reason',)
+)
+answers_total = metrics.counter(
+    'jargon_answers_total', 'Results by the detection stage that answered', ('stage',)
+)
+degraded_total = metrics.counter(
+    'jargon_degraded_responses_total', 'Results answered rule-based in place of the model',
+    ('reason',)
+)
+
+def run_model(texts, **batch_options):
+    """Score texts with the loaded model using the configured windowing"""
+    # Take the active model once so a reload can't swap it mid-batch
+    current = active_model
+    stats = {}
+    results = detect_jargon_batch_with_model(
+        texts, current.tokenizer, current.model, current.device,
+        window=WINDOW_TOKENS, stride=WINDOW_STRIDE, stats=stats, **batch_options
+    )
+    for stage in ('tokenize', 'forward', 'extract'):
+        stage_seconds.observe(stats[stage], stage)
+    for size in stats['batch_sizes']:
+        model_batch_size.observe(size)
+    for length in stats['window_tokens']:
+        window_tokens.observe(length)
+    return results
+
+# Batch concurrent detection requests into shared forward passes
+BATCH_MAX_SIZE = int(os.environ.get('JARGON_BATCH_MAX_SIZE', '16'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('JARGON_BATCH_MAX_WAIT_MS', '5'))
+
+# Admission control: requests beyond the queue capacity, or whose estimated
+# wait exceeds the latency budget, get a degraded rule-based answer instead.
+# Clients opt in with `latency_budget_ms`; JARGON_LATENCY_BUDGET_MS sets a
+# default for those that don't (0, the default, waits for the model)
+QUEUE_CAPACITY = int(os.environ.get('JARGON_QUEUE_CAPACITY', '256'))
+LATENCY_BUDGET_MS = float(os.environ.get('JARGON_LATENCY_BUDGET_MS', '0'))
+
+# Detection cascade: with JARGON_CASCADE=1, texts of at most
+# JARGON_CASCADE_MAX_WORDS words that the rule-based and glossary matchers
+# settle on their own (see cascade.needs_model) skip the model
+CASCADE_ENABLED = os.environ.get('JARGON_CASCADE', '0') == '1'
+CASCADE_MAX_WORDS = int(os.environ.get('JARGON_CASCADE_MAX_WORDS', '12'))
+CASCADE_MIN_SUSPICIOUS = int(os.environ.get('JARGON_CASCADE_MIN_SUSPICIOUS', '1'))
+
+jargon_batcher = None
+if os.environ.get('JARGON_BATCHING', '1') != '0':
+    jargon_batcher = MicroBatcher(
+        run_model,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        max_queue=QUEUE_CAPACITY
+    )
+
+# Recently computed detection results
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('JARGON_RESULT_CACHE_SIZE', '10000')),
+    max_bytes=int(os.environ.get('JARGON_RESULT_CACHE_MB', '64')) * 1024 * 1024
+)
+
+# Sentence-level predictions of drafts being typed, for incremental detection
+draft_sessions = DraftSessions(
+    max_sessions=int(os.environ.get('JARGON_DRAFT_SESSIONS', '1000'))
+)
+
+metrics.callback(
+    'jargon_model_ready', 'Whether the model is answering requests',
+    lambda: {(model_version, model_state): int(MODEL_LOADED)},
+    labelnames=('model_version', 'state')
+)
+metrics.callback(
+    'jargon_inference_queue_depth', 'Requests waiting for the model',
+    lambda: jargon_batcher.queue_depth() if jargon_batcher else 0
+)
+metrics.callback(
+    'jargon_inference_estimated_wait_seconds', 'Estimated wait for a newly queued request',
+    lambda: jargon_batcher.estimated_wait() if jargon_batcher else 0
+)
+for stat, kind in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+                   ('entries', 'gauge'), ('bytes', 'gauge')):
+    metrics.callback(
+        f"jargon_result_cache_{stat}{'_total' if kind == 'counter' else ''}",
+        f'Result cache {stat}', lambda stat=stat: result_cache.stats()[stat], kind
+    )
+
+# Limits for the bulk /detect-jargon/batch endpoint
+BULK_MAX_TEXTS = int(os.environ.get('JARGON_BULK_MAX_TEXTS', '1000'))
+BULK_BATCH_SIZE = int(os.environ.get('JARGON_BULK_BATCH_SIZE', '32'))
+BULK_MAX_BATCH_TOKENS = int(os.environ.get('JARGON_BULK_MAX_BATCH_TOKENS', '8192'))
+
+# Common business jargon patterns for the rule-based fallback
+JARGON_TERMS = [
+    'KPI', 'KPIs', 'OKR', 'OKRs', 'MRR', 'ARR', 'CAC', 'LTV',
+    'synerg', 'leverage', 'bandwidth', 'circle back', 'touch base',
+    'deep dive', 'drill down', 'move the needle', 'low-hanging fruit',
+    'paradigm shift', 'core competenc', 'best practice', 'value-add',
+    'deliverable', 'action item', 'stakeholder', 'think outside the box',
+    'take it offline', 'boil the ocean', 'ballpark', 'ping',
+    'deck', 'standup', 'sprint', 'velocity', 'north star metric',
+    'unit economics', 'burn rate', 'runway'
+]
+
+# Compiled once so each request is a single pass over the text
+jargon_term_matcher = TermMatcher(JARGON_TERMS)
+
+# Compiled glossary matchers, reused across requests for the same glossary
+glossary_matchers = GlossaryMatcherCache(
+    max_entries=int(os.environ.get('JARGON_GLOSSARY_CACHE_SIZE', '128'))
+)
+
+# Glossaries uploaded ahead of time and referenced by glossary_id; with
+# JARGON_GLOSSARY_DIR they are shared by every process using that directory
+glossary_store = GlossaryStore(os.environ.get('JARGON_GLOSSARY_DIR') or None)
+
+class UnknownGlossaryError(Exception):
+    """Raised when a request references a glossary that isn't registered"""
+
+    def __init__(self, glossary_id):
+        super().__init__(f"Unknown glossary: {glossary_id}")
+        self.glossary_id = glossary_id
+
+@app.errorhandler(UnknownGlossaryError)
+def unknown_glossary(e):
+    return jsonify({"error": str(e), "glossary_id": e.glossary_id}), 404
+
+def resolve_glossary(data):
+    """
+    Find the glossary a request refers to.
     
+    Requests may name a registered glossary with `glossary_id` (and optionally
+    `glossary_version`) or ship the entries inline as `glossary`. An inline
+    glossary is used when the referenced one is missing or stale.
+    
+    Returns:
+        Tuple of (entries, compiled matcher or None, glossary key)
+    """
+    glossary_id = data.get("glossary_id")
+    if glossary_id:
+        registered = glossary_store.get(glossary_id, data.get("glossary_version"))
+        if registered is not None:
+            return registered.entries, registered.matcher, registered.fingerprint
+        if "glossary" not in data:
+            raise UnknownGlossaryError(glossary_id)
+    
+    glossary = data.get("glossary") or []
+    if not glossary:
+        return [], None, None
+    
+    key = glossary_fingerprint(glossary)
+    return glossary, glossary_matchers.get(glossary, key), key
+
+def detect_jargon_rule_based(text, reason='model_not_loaded'):
+    """Fallback rule-based jargon detection"""
+    rule_based_total.inc(reason)
+    return match_jargon_terms(text)
+
+def match_jargon_terms(text):
+    """Spans of the common jargon terms in a text"""
     spans = []
-    text_lower = text.lower()
+    for start, end, _ in jargon_term_matcher.find(text):
+        spans.append({
+            'start': start,
+            'end': end,
+            'confidence': 0.7,
+            'term': text[start:end],
+            'suggestion': f'Consider simplifying "{text[start:end]}"'
+        })
     
-    for term in jargon_terms:
-        term_lower = term.lower()
-        start = 0
-        while True:
-            idx = text_lower.find(term_lower, start)
-            if idx == -1:
-                break
-            
-            # Check word boundaries
-            if (idx == 0 or not text[idx-1].isalnum()) and \
-               (idx + len(term) >= len(text) or not text[idx + len(term)].isalnum()):
-                spans.append({
-                    'start': idx,
-                    'end': idx + len(term),
-                    'confidence': 0.7,
-                    'term': text[idx:idx + len(term)],
-                    'suggestion': f'Consider simplifying "{text[idx:idx + len(term)]}"'
-                })
-            
-            start = idx + 1
-    
-    # Sort by start position and remove duplicates
-    spans.sort(key=lambda x: x['start'])
-    unique_spans = []
-    for span in spans:
-        if not any(s['start'] <= span['start'] < s['end'] for s in unique_spans):
-            unique_spans.append(span)
-    
-    return unique_spans
+    return spans
 
-@app.post("/detect-jargon")
-def detect_jargon():
-    data = request.json or {}
-    text = data.get("text", "")
-    glossary = data.get("glossary", [])
+def add_glossary_spans(text, spans, matcher):
+    """Merge organization glossary terms into spans where they don't overlap"""
+    if matcher is None:
+        return spans
+    
+    with stage_seconds.time('glossary'):
+        return merge_spans(spans, matcher.find_spans(text))
 
-    if not text.strip():
-        return jsonify({"jargon_spans": [], "jargon_score": 0})
+def detect_spans_many(texts, budget_ms=None):
+    """
+    Detect jargon spans with the model, falling back to rule-based.
+    
+    Args:
+        texts: Texts to score; they share batches with concurrent requests
+        budget_ms: Latency budget for waiting on the model; defaults to
+            JARGON_LATENCY_BUDGET_MS, and 0 waits as long as it takes
+    
+    Returns:
+        Tuple of (list of spans, degraded_reason). degraded_reason is None when
+        the answer is the normal one; otherwise the rule-based detector stood
+        in for the model and the result must not be cached
+    """
+    if MODEL_LOADED and jargon_model is not None:
+        if budget_ms is None:
+            budget_ms = LATENCY_BUDGET_MS
+        try:
+            if jargon_batcher is not None:
+                timeout = budget_ms / 1000.0 if budget_ms > 0 else None
+                return jargon_batcher.submit_many(texts, timeout=timeout), None
+            return run_model(texts), None
+        except AdmissionRejected as e:
+            return [detect_jargon_rule_based(text, e.reason) for text in texts], e.reason
+        except Exception as e:
+            print(f"Model inference error: {e}")
+            return [detect_jargon_rule_based(text, 'model_error') for text in texts], 'model_error'
+    
+    return [detect_jargon_rule_based(text) for text in texts], None
 
-    # Use model if loaded, otherwise use rule-based
+def detect_spans(text, budget_ms=None):
+    """Single-text version of detect_spans_many returning (spans, degraded_reason)"""
+    spans, degraded_reason = detect_spans_many([text], budget_ms)
+    return spans[0], degraded_reason
+
+def detect_spans_batch(texts):
+    """Batched version of detect_spans returning (list of spans, degraded_reason)"""
     if MODEL_LOADED and jargon_model is not None:
         try:
-            spans = detect_jargon_with_model(text, jargon_tokenizer, jargon_model, device)
+            return run_model(
+                texts,
+                batch_size=BULK_BATCH_SIZE,
+                max_batch_tokens=BULK_MAX_BATCH_TOKENS
+            ), None
         except Exception as e:
             print(f"Model inference error: {e}")
-            spans = detect_jargon_rule_based(text)
-    else:
-        spans = detect_jargon_rule_based(text)
+            return [detect_jargon_rule_based(text, 'model_error') for text in texts], 'model_error'
     
-    # Add glossary terms
-    for entry in glossary:
-        term = entry.get("term", "")
-        plain = entry.get("plainLanguage", "")
-        
-        if term and term.lower() in text.lower():
-            idx = text.lower().index(term.lower())
-            
-            # Check for overlaps with existing spans
-            overlaps = any(
-                (s["start"] <= idx < s["end"]) or 
-                (s["start"] < idx + len(term) <= s["end"])
-                for s in spans
-            )
-            
-            if not overlaps:
-                spans.append({
-                    "start": idx,
-                    "end": idx + len(term),
-                    "confidence": 0.95,
-                    "term": text[idx:idx + len(term)],
-                    "suggestion": plain if plain else "Provide a simpler explanation",
-                    "from_glossary": True
-                })
-    
-    # Calculate jargon score
-    if spans:
-        avg_confidence = sum(s["confidence"] for s in spans) / len(spans)
-        word_count = len(text.split())
-        jargon_score = min(1.0, (len(spans) / max(word_count, 1)) * avg_confidence * 2)
-    else:
-        jargon_score = 0
+    return [detect_jargon_rule_based(text) for text in texts], None
+
+def settle_without_model(text, glossary_matcher):
+    """
+    First stage of the detection cascade.
     
-    return jsonify({
+    Returns the rule-based spans when the cascade is enabled and the
+    rule-based and glossary matchers settle the text on their own, or None
+    when the model has to run.
+    """
+    if not CASCADE_ENABLED or len(text.split()) > CASCADE_MAX_WORDS:
+        return None
+    
+    spans = match_jargon_terms(text)
+    cheap_spans = spans + (glossary_matcher.find_spans(text) if glossary_matcher else [])
+    if needs_model(text, cheap_spans, CASCADE_MAX_WORDS, CASCADE_MIN_SUSPICIOUS):
+        return None
+    return spans
+
+def build_result(text, spans, glossary_matcher, degraded_reason=None, stage=None):
+    """
+    Response for a text's detected spans. `stage` names what answered:
+    'model', 'cascade' when the cascade skipped the model, or 'rule_based'
+    when the model wasn't available; it is worked out when not given.
+    """
+    if stage is None:
+        model_ready = MODEL_LOADED and jargon_model is not None
+        stage = 'model' if model_ready and degraded_reason is None else 'rule_based'
+    answers_total.inc(stage)
+    
+    spans = add_glossary_spans(text, spans, glossary_matcher)
+    result = {
         "jargon_spans": spans,
-        "jargon_score": jargon_score
-    })
+        "jargon_score": compute_jargon_score(text, spans),
+        "degraded": degraded_reason is not None,
+        "stage": stage,
+        "model_version": model_version
+    }
+    if degraded_reason is not None:
+        result["degraded_reason"] = degraded_reason
+        degraded_total.inc(degraded_reason)
+    return result
+
+def request_budget_ms(data):
+    """Per-request latency budget from `latency_budget_ms`, if the client sent one"""
+    budget = data.get("latency_budget_ms")
+    if isinstance(budget, (int, float)) and not isinstance(budget, bool) and budget >= 0:
+        return float(budget)
+    return None
+
+def detect_jargon_in_text(text, glossary_matcher, glossary_key, budget_ms=None):
+    """Full detection result for one text, served from the cache when possible"""
+    if not text.strip():
+        return {"jargon_spans": [], "jargon_score": 0, "degraded": False}
+    
+    cache_key = make_cache_key(text, glossary_key, model_version)
+    result = result_cache.get(cache_key)
+    if result is None:
+        result = compute_jargon_result(text, glossary_matcher, cache_key, budget_ms)
+    
+    return result
+
+def compute_jargon_result(text, glossary_matcher, cache_key, budget_ms=None):
+    """Run detection for a text that missed the cache and cache the result"""
+    degraded_reason = None
+    spans = None
+    if MODEL_LOADED and jargon_model is not None:
+        spans = settle_without_model(text, glossary_matcher)
+    
+    if spans is not None:
+        result = build_result(text, spans, glossary_matcher, stage='cascade')
+    else:
+        spans, degraded_reason = detect_spans(text, budget_ms)
+        result = build_result(text, spans, glossary_matcher, degraded_reason)
+    
+    # Results that straddled a model reload aren't cached under either version
+    if degraded_reason is None and cache_key[2] == model_version:
+        result_cache.put(cache_key, result)
+    return result
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    started = g.pop('request_started', None)
+    if started is not None and request.url_rule is not None:
+        request_seconds.observe(time.perf_counter() - started, request.url_rule.rule)
+    return response
+
+def read_request_json():
+    with stage_seconds.time('parse'):
+        return request.json or {}
+
+def json_response(payload):
+    with stage_seconds.time('serialize'):
+        return jsonify(payload)
+
+@app.post("/detect-jargon")
+def detect_jargon():
+    data = read_request_json()
+    text = data.get("text", "")
+    _, glossary_matcher, glossary_key = resolve_glossary(data)
+    
+    return json_response(detect_jargon_in_text(
+        text, glossary_matcher, glossary_key, request_budget_ms(data)
+    ))
+
+@app.post("/detect-jargon/incremental")
+def detect_jargon_incremental():
+    data = read_request_json()
+    session_id = data.get("session_id")
+    text = data.get("text", "")
+    _, glossary_matcher, _ = resolve_glossary(data)
+
+    if not session_id or not isinstance(session_id, str):
+        return jsonify({"error": "session_id is required"}), 400
+    if not text.strip():
+        draft_sessions.discard(session_id)
+        return jsonify({"jargon_spans": [], "jargon_score": 0, "degraded": False,
+                        "sentences_rescored": 0})
+
+    budget_ms = request_budget_ms(data)
+    version = model_version
+    spans, predictions, rescored, degraded_reason = detect_incremental(
+        text,
+        draft_sessions.get(session_id, version),
+        lambda sentences: detect_spans_many(sentences, budget_ms)
+    )
+    draft_sessions.put(session_id, version, predictions)
+
+    result = build_result(text, spans, glossary_matcher, degraded_reason)
+    result["sentences_rescored"] = rescored
+    return json_response(result)
+
+@app.post("/detect-jargon/batch")
+def detect_jargon_batch():
+    data = read_request_json()
+    texts = data.get("texts", [])
+    _, glossary_matcher, glossary_key = resolve_glossary(data)
+
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return jsonify({"error": "texts must be a list of strings"}), 400
+    if len(texts) > BULK_MAX_TEXTS:
+        return jsonify({"error": f"At most {BULK_MAX_TEXTS} texts per request"}), 400
+
+    results = []
+    cache_keys = {}
+
+    # Only non-blank texts that aren't cached go through detection
+    for i, text in enumerate(texts):
+        if not text.strip():
+            results.append({"jargon_spans": [], "jargon_score": 0, "degraded": False})
+            continue
+        cache_keys[i] = make_cache_key(text, glossary_key, model_version)
+        results.append(result_cache.get(cache_keys[i]))
+    
+    to_score = [i for i, result in enumerate(results) if result is None]
+    if to_score and MODEL_LOADED and jargon_model is not None:
+        for i in to_score:
+            spans = settle_without_model(texts[i], glossary_matcher)
+            if spans is not None:
+                results[i] = build_result(texts[i], spans, glossary_matcher, stage='cascade')
+                if cache_keys[i][2] == model_version:
+                    result_cache.put(cache_keys[i], results[i])
+        to_score = [i for i in to_score if results[i] is None]
+    
+    if to_score:
+        scored, degraded_reason = detect_spans_batch([texts[i] for i in to_score])
+        for i, spans in zip(to_score, scored):
+            results[i] = build_result(texts[i], spans, glossary_matcher, degraded_reason)
+            if degraded_reason is None and cache_keys[i][2] == model_version:
+                result_cache.put(cache_keys[i], results[i])
+
+    return json_response({"results": results})
 
 @app.post("/rewrite")
 def rewrite():
-    data = request.json or {}
+    """
+    Deterministic rewrite that swaps glossary terms for their plain language.
+    
+    `llmRecommended` is set when a full rewrite still has work to do: jargon
+    the glossary doesn't explain, detection that fell back to the rule-based
+    terms and may have missed some, or a tone or audience other than the
+    defaults.
+    """
+    data = read_request_json()
     text = data.get("text", "")
-    audience = data.get("audience", "PMs")
-    tone = data.get("tone", "Neutral")
+    audience = str(data.get("audience") or "PMs")
+    tone = str(data.get("tone") or "Neutral")
+    _, glossary_matcher, glossary_key = resolve_glossary(data)
+    
+    detection = detect_jargon_in_text(text, glossary_matcher, glossary_key, request_budget_ms(data))
+    rewritten, substitutions, unresolved = rewrite_with_glossary(
+        text, glossary_matcher, detection["jargon_spans"]
+    )
+    
+    reasons = []
+    if unresolved:
+        reasons.append("unresolved_jargon")
+    if detection["degraded"] or detection.get("stage") == "rule_based":
+        reasons.append("degraded")
+    if tone.lower() != "neutral":
+        reasons.append("tone")
+    if audience.lower() != "pms":
+        reasons.append("audience")
+    
+    return json_response({
+        "rewrittenText": rewritten,
+        "llmRecommended": bool(reasons),
+        "reasons": reasons,
+        "substitutions": substitutions,
+        "unresolvedTerms": unresolved,
+        "degraded": detection["degraded"]
+    })
+
+@app.put("/glossaries/<glossary_id>")
+def put_glossary(glossary_id):
+    data = request.json or {}
+    version = data.get("version")
     glossary = data.get("glossary", [])
 
-    glossary_text = "; ".join(
-        f'{item["term"]}: {item["plainLanguage"]}' 
-        for item in glossary
-    ) if glossary else "None"
-    
-    rewritten = f"[Rewrite for {audience} in {tone} tone | Glossary: {glossary_text}]\n{text}"
+    if version is None:
+        return jsonify({"error": "version is required"}), 400
+    if not isinstance(glossary, list) or not all(
+        isinstance(entry, dict) and isinstance(entry.get("term", ""), str)
+        for entry in glossary
+    ):
+        return jsonify({"error": "glossary must be a list of {term, plainLanguage} objects"}), 400
+
+    entries = [
+        {"term": entry.get("term", ""), "plainLanguage": entry.get("plainLanguage", "")}
+        for entry in glossary
+    ]
+    registered = glossary_store.put(glossary_id, str(version), entries)
+    return jsonify(registered.describe())
+
+@app.get("/glossaries/<glossary_id>")
+def get_glossary(glossary_id):
+    registered = glossary_store.get(glossary_id)
+    if registered is None:
+        raise UnknownGlossaryError(glossary_id)
+    return jsonify(registered.describe())
+
+@app.delete("/glossaries/<glossary_id>")
+def delete_glossary(glossary_id):
+    if not glossary_store.delete(glossary_id):
+        raise UnknownGlossaryError(glossary_id)
+    return jsonify({"glossary_id": glossary_id, "deleted": True})
+
+@app.post("/admin/reload-model")
+def admin_reload_model():
+    """Load a model next to the active one and swap it in once warmed up"""
+    admin_token = os.environ.get('JARGON_ADMIN_TOKEN')
+    if not admin_token:
+        return jsonify({"error": "Model reload is disabled; set JARGON_ADMIN_TOKEN"}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+        return jsonify({"error": "Invalid admin token"}), 403
     
-    return jsonify({"rewrittenText": rewritten})
+    data = request.get_json(silent=True) or {}
+    if not reload_model(data.get('model_path'), data.get('tokenizer_path'), data.get('backend')):
+        return jsonify({"error": "A model reload is already in progress", "reload": reload_status}), 409
+    return jsonify({"reload": reload_status, "model_version": model_version}), 202
 
 @app.get("/health")
 def health():
     return jsonify({
         "status": "healthy",
+        "ready": model_state != 'loading',
+        "model_state": model_state,
         "model_loaded": MODEL_LOADED,
-        "device": str(device) if device else "unknown"
+        "model_version": model_version,
+        "model_reload": dict(reload_status),
+        "device": str(device) if device else "unknown",
+        "result_cache": result_cache.stats(),
+        "inference_queue": {
+            "depth": jargon_batcher.queue_depth() if jargon_batcher else 0,
+            "capacity": QUEUE_CAPACITY,
+            "estimated_wait_ms": jargon_batcher.estimated_wait() * 1000 if jargon_batcher else 0
+        }
     })
 
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Start loading the model; requests are served rule-based until it is ready
+start_model_loading()
+if os.environ.get('JARGON_PREFORK') != '1':
+    start_model_watch()
+
 if __name__ == "__main__":
     app.run(port=5001, debug=True)
\ No newline at end of file
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+import app as service
+from result_cache import make_cache_key
+
+# Bounded pool that runs detection off the event loop; its threads feed the
+# micro-batcher, so this is also the most texts one process scores at once
+ASYNC_WORKERS = int(os.environ.get('JARGON_ASYNC_WORKERS', '16'))
+executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix='jargon-detect')
+
+# Routes handed to Flask run in a pool of their own, so a bulk request there
+# neither blocks other Flask routes nor takes threads from /detect-jargon
+WSGI_WORKERS = int(os.environ.get('JARGON_WSGI_WORKERS', '8'))
+wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_WORKERS, thread_name_prefix='jargon-wsgi')
+
+
+class InflightRequests:
+    """
+    Share a single in-flight computation between identical concurrent requests.
+
+    The first request for a key starts the computation; requests for the same
+    key that arrive before it finishes await the same future. A caller that
+    goes away doesn't cancel the computation for the others.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._futures)
+
+    async def run(self, key, start):
+        future = self._futures.get(key)
+        if future is None:
+            future = start()
+            self._futures[key] = future
+            future.add_done_callback(lambda _: self._futures.pop(key, None))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+
+inflight = InflightRequests()
+service.metrics.callback(
+    'jargon_inflight_started_total', 'Detections started by the async server',
+    lambda: inflight.started, 'counter'
+)
+service.metrics.callback(
+    'jargon_inflight_coalesced_total', 'Requests that shared an in-flight detection',
+    lambda: inflight.coalesced, 'counter'
+)
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    """
+    asgiref's WSGI adapter runs every request on one shared thread; this
+    runs each request on a thread of `wsgi_executor` instead.
+    """
+
+    def run_wsgi_app(self, body):
+        return sync_to_async(
+            WsgiToAsgiInstance.run_wsgi_app.__wrapped__,
+            thread_sensitive=False,
+            executor=wsgi_executor
+        )(self, body)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiInstance(self.wsgi_application, self.duplicate_header_limit)(
+            scope, receive, send
+        )
+
+
+flask_app = PooledWsgiToAsgi(service.app)
+
+
+async def read_json(receive):
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    with service.stage_seconds.time('parse'):
+        return json.loads(body) if body else {}
+
+
+async def send_json(send, payload, status=200):
+    with service.stage_seconds.time('serialize'):
+        body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*')
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def detect_jargon(receive, send):
+    try:
+        data = await read_json(receive)
+    except ValueError:
+        return await send_json(send, {"error": "Request body must be JSON"}, 400)
+    if not isinstance(data, dict):
+        data = {}
+
+    text = data.get("text", "")
+    try:
+        _, glossary_matcher, glossary_key = service.resolve_glossary(data)
+    except service.UnknownGlossaryError as e:
+        return await send_json(send, {"error": str(e), "glossary_id": e.glossary_id}, 404)
+
+    if not text.strip():
+        return await send_json(send, {"jargon_spans": [], "jargon_score": 0, "degraded": False})
+
+    # Cached results are answered on the event loop without a thread hop
+    key = make_cache_key(text, glossary_key, service.model_version)
+    result = service.result_cache.get(key)
+
+    if result is None:
+        # Only requests with the same latency budget share a computation, so
+        # none gets a degraded answer it didn't accept or waits longer than
+        # its budget allows
+        budget_ms = service.request_budget_ms(data)
+        if budget_ms is None:
+            budget_ms = service.LATENCY_BUDGET_MS
+        loop = asyncio.get_running_loop()
+        result = await inflight.run((key, budget_ms), lambda: loop.run_in_executor(
+            executor, service.compute_jargon_result, text, glossary_matcher, key, budget_ms
+        ))
+
+    await send_json(send, result)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=False)
+            wsgi_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """
+    ASGI entry point: `uvicorn asgi:application --port 5001`.
+
+    /detect-jargon is served natively with inference in a bounded thread pool
+    and identical in-flight requests coalesced; every other route is handed
+    to the Flask app.
+    """
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if (scope['type'] == 'http' and scope['method'] == 'POST' and
+            scope['path'].rstrip('/') == '/detect-jargon'):
+        started = time.perf_counter()
+        await detect_jargon(receive, send)
+        service.request_seconds.observe(time.perf_counter() - started, '/detect-jargon')
+        return
+    return await flask_app(scope, receive, send)
@@ -0,0 +1,153 @@
+import os
+from types import SimpleNamespace
+
+import torch
+from transformers import RobertaForTokenClassification
+
+BACKENDS = ('torch', 'torch-int8', 'onnx')
+
+
+def is_model_dir(path):
+    """Whether `path` is a self-contained model directory from save_pretrained"""
+    return os.path.isfile(os.path.join(path, 'config.json'))
+
+
+def default_onnx_path(model_path):
+    if os.path.isdir(model_path):
+        return os.path.join(model_path, 'model.onnx')
+    return os.path.splitext(model_path)[0] + '.onnx'
+
+
+def artifact_version(path):
+    """Identify a model artifact by file name and modification time"""
+    name = os.path.basename(os.path.normpath(path))
+    if os.path.isdir(path):
+        weights = os.path.join(path, 'model.safetensors')
+        if os.path.exists(weights):
+            path = weights
+    return f"{name}@{int(os.path.getmtime(path))}"
+
+
+def load_torch_model(model_path, device):
+    """
+    Load the fine-tuned fp32 RoBERTa token classifier.
+
+    `model_path` is either a self-contained model directory (config plus
+    safetensors weights, which are memory-mapped rather than copied) or a
+    legacy state dict file that is applied on top of roberta-base.
+    """
+    if is_model_dir(model_path):
+        model = RobertaForTokenClassification.from_pretrained(model_path)
+    else:
+        model = RobertaForTokenClassification.from_pretrained(
+            'roberta-base',
+            num_labels=2  # 0: Non-jargon, 1: Jargon
+        )
+
+        # Load the fine-tuned weights
+        state_dict = torch.load(model_path, map_location=device)
+        model.load_state_dict(state_dict)
+
+    model.to(device)
+    model.eval()
+    return model
+
+
+def quantize_int8(model):
+    """Dynamically quantize a model's Linear layers to int8 (CPU only)"""
+    model = model.to('cpu')
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+class OnnxTokenClassifier:
+    """
+    ONNX Runtime session with the calling convention of the torch model.
+
+    Calling it with `input_ids` and `attention_mask` tensors returns an object
+    with a `logits` tensor, so it can stand in for the torch model anywhere in
+    the inference code.
+    """
+
+    def __init__(self, onnx_path, intra_op_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                "The onnx backend needs onnxruntime: pip install onnxruntime"
+            ) from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+
+        self.onnx_path = onnx_path
+        self.session = ort.InferenceSession(
+            onnx_path, options, providers=['CPUExecutionProvider']
+        )
+
+    def __call__(self, input_ids, attention_mask):
+        logits, = self.session.run(['logits'], {
+            'input_ids': input_ids.cpu().numpy(),
+            'attention_mask': attention_mask.cpu().numpy()
+        })
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+    def to(self, device):
+        return self
+
+    def eval(self):
+        return self
+
+
+def export_onnx(model, onnx_path, opset_version=17):
+    """Export a token classifier to ONNX with dynamic batch and sequence axes"""
+    model = model.to('cpu').eval()
+    input_ids = torch.ones((2, 16), dtype=torch.long)
+    attention_mask = torch.ones((2, 16), dtype=torch.long)
+
+    torch.onnx.export(
+        model,
+        (input_ids, attention_mask),
+        onnx_path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=['logits'],
+        dynamic_axes={
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            'logits': {0: 'batch', 1: 'sequence'}
+        },
+        opset_version=opset_version,
+        dynamo=False
+    )
+    return onnx_path
+
+
+def load_backend(name, model_path, device, onnx_path=None):
+    """
+    Load the jargon model for the given inference backend.
+
+    Args:
+        name: One of BACKENDS
+        model_path: Model directory or fine-tuned weights, used by the torch backends
+        device: Device for the torch backends; int8 and onnx always run on CPU
+        onnx_path: Exported ONNX graph, used by the onnx backend
+
+    Returns:
+        Tuple of (model, device) where model is callable like the torch model
+    """
+    if name == 'torch':
+        return load_torch_model(model_path, device), device
+    if name == 'torch-int8':
+        return quantize_int8(load_torch_model(model_path, 'cpu')), torch.device('cpu')
+    if name == 'onnx':
+        onnx_path = onnx_path or default_onnx_path(model_path)
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(
+                f"No ONNX model at {onnx_path}; create one with export_onnx.py"
+            )
+        return OnnxTokenClassifier(onnx_path), torch.device('cpu')
+
+    raise ValueError(f"Unknown backend {name!r}; expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,244 @@
+import os
+import queue
+import threading
+import time
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request can't be scored by the model in time.
+
+    `reason` is 'queue_full' when the queue is at capacity, 'over_budget' when
+    the estimated wait already exceeds the request's budget and
+    'deadline_exceeded' when the budget ran out while waiting.
+    """
+
+    def __init__(self, reason):
+        super().__init__(f'Inference request rejected: {reason}')
+        self.reason = reason
+
+
+# Characters counted as one unit of work; shorter texts still cost a unit,
+# as padding and per-batch overhead dominate for them
+WORK_UNIT_CHARS = 500
+
+
+def text_work(text):
+    """Units of inference work a text is expected to take"""
+    return max(1.0, len(text) / WORK_UNIT_CHARS)
+
+
+class _PendingRequest:
+    """A single text waiting for its share of a batched forward pass"""
+
+    def __init__(self, text):
+        self.text = text
+        self.work = text_work(text)
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+
+
+class MicroBatcher:
+    """
+    Collect concurrent inference requests into one padded forward pass.
+
+    A background worker takes the first waiting request, gathers whatever else
+    arrives within `max_wait_ms` (up to `max_batch_size` texts), runs
+    `process_batch` once and hands each caller its own result. The worker only
+    lingers for more requests when the previous batch had company, so a lone
+    request on an idle service is dispatched immediately.
+
+    The worker thread is started on first use in each process, so a batcher
+    created before a server forks its workers still works in every worker.
+
+    Admission is bounded: at most `max_queue` requests wait at once, and a
+    request with a latency budget is turned away up front when the estimated
+    wait is already over budget. The estimate is the work queued ahead of it
+    and its own, in units of `text_work`, times a moving average of the
+    seconds a unit took in recent batches, so one long document doesn't make
+    short texts look expensive. An idle batcher always admits, so the
+    average keeps being refreshed after a slow batch.
+
+    Args:
+        process_batch: Callable taking a list of texts and returning one
+            result per text, in the same order
+        max_batch_size: Largest number of texts run in a single pass
+        max_wait_ms: How long to hold a batch open for more requests
+        max_queue: Requests allowed to wait at once; 0 means unbounded
+    """
+
+    def __init__(self, process_batch, max_batch_size=16, max_wait_ms=5, max_queue=0):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue = max(0, int(max_queue))
+        self._queue = None
+        self._last_batch_size = 0
+        self._busy = False
+        self._unit_seconds = None
+        self._queued_work = 0.0
+        self._running_work = 0.0
+        self._work_lock = threading.Lock()
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._last_batch_size = 0
+                self._busy = False
+                self._queued_work = self._running_work = 0.0
+                threading.Thread(target=self._run, args=(self._queue,),
+                                 name='jargon-batcher', daemon=True).start()
+                self._pid = os.getpid()
+
+    def estimated_wait(self, work=1.0):
+        """Seconds a request of `work` units queued now would take to be answered"""
+        if self._unit_seconds is None or self._queue is None:
+            return 0.0
+        # A batch already running is, on average, half done
+        with self._work_lock:
+            ahead = self._queued_work + self._running_work / 2
+        return (ahead + work) * self._unit_seconds
+
+    def _over_budget(self, work, timeout):
+        if timeout is None or (not self._busy and self._queue.empty()):
+            return False
+        return self.estimated_wait(work) > timeout
+
+    def _put(self, pending):
+        self._queue.put_nowait(pending)
+        with self._work_lock:
+            self._queued_work += pending.work
+
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, text, timeout=None):
+        """
+        Queue a text and block until its result is ready.
+
+        Args:
+            text: Text to score
+            timeout: Latency budget in seconds, or None to wait indefinitely
+
+        Raises:
+            AdmissionRejected: If the request is shed or runs out of budget
+        """
+        self._ensure_started()
+
+        pending = _PendingRequest(text)
+        if self._over_budget(pending.work, timeout):
+            raise AdmissionRejected('over_budget')
+
+        try:
+            self._put(pending)
+        except queue.Full:
+            raise AdmissionRejected('queue_full')
+
+        if not pending.done.wait(timeout):
+            # Let the worker skip it if it hasn't been picked up yet
+            pending.abandoned = True
+            raise AdmissionRejected('deadline_exceeded')
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def submit_many(self, texts, timeout=None):
+        """
+        Queue several texts together and block until all results are ready.
+
+        The texts share the batches of concurrent requests and are admitted
+        or rejected as a group, with the same budget semantics as `submit`.
+        """
+        self._ensure_started()
+        if not texts:
+            return []
+
+        pending_requests = [_PendingRequest(text) for text in texts]
+        if self._over_budget(sum(pending.work for pending in pending_requests), timeout):
+            raise AdmissionRejected('over_budget')
+        if self.max_queue and self._queue.qsize() + len(texts) > self.max_queue:
+            raise AdmissionRejected('queue_full')
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        try:
+            for pending in pending_requests:
+                self._put(pending)
+        except queue.Full:
+            for pending in pending_requests:
+                pending.abandoned = True
+            raise AdmissionRejected('queue_full')
+
+        for pending in pending_requests:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not pending.done.wait(remaining):
+                for other in pending_requests:
+                    other.abandoned = True
+                raise AdmissionRejected('deadline_exceeded')
+            if pending.error is not None:
+                raise pending.error
+
+        return [pending.result for pending in pending_requests]
+
+    def _collect(self, requests):
+        batch = [requests.get()]
+
+        # Take everything that is already queued without waiting
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(requests.get_nowait())
+            except queue.Empty:
+                break
+
+        # Under concurrent load, hold the batch open a little longer
+        if self.max_wait and (len(batch) > 1 or self._last_batch_size > 1):
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+        return batch
+
+    def _run(self, requests):
+        while True:
+            collected = self._collect(requests)
+            batch = [pending for pending in collected if not pending.abandoned]
+            work = sum(pending.work for pending in batch)
+            with self._work_lock:
+                self._queued_work = max(0.0, self._queued_work - sum(p.work for p in collected))
+                self._running_work = work
+            self._last_batch_size = len(batch)
+            if not batch:
+                continue
+
+            self._busy = True
+            started = time.monotonic()
+            try:
+                results = self.process_batch([pending.text for pending in batch])
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finally:
+                unit_seconds = (time.monotonic() - started) / work
+                self._unit_seconds = (
+                    unit_seconds if self._unit_seconds is None
+                    else 0.8 * self._unit_seconds + 0.2 * unit_seconds
+                )
+                with self._work_lock:
+                    self._running_work = 0.0
+                self._busy = False
+                for pending in batch:
+                    pending.done.set()
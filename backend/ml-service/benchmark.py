@@ -0,0 +1,319 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from compare_backends import summarize_latency
+
+# Word counts of generated messages, from one-line chat replies to long
+# write-ups that need several model windows
+LENGTH_BUCKETS = {'short': (3, 15), 'medium': (30, 80), 'long': (300, 700)}
+JARGON_DENSITIES = (0.0, 0.05, 0.2)
+GLOSSARY_SIZES = (0, 10, 100, 1000, 5000)
+
+FILLER_WORDS = (
+    'the team will review this document before our meeting tomorrow and '
+    'send the notes to everyone who could not join please let me know if '
+    'anything is missing from the plan we agreed on last week thanks again '
+    'for the help with the launch customers liked the new page'
+).split()
+
+BUSINESS_JARGON = [
+    'KPI', 'KPIs', 'OKR', 'MRR', 'ARR', 'CAC', 'LTV', 'ROI', 'synergy',
+    'leverage', 'circle back', 'touch base', 'deep dive', 'low-hanging fruit',
+    'move the needle', 'bandwidth', 'deliverable', 'stakeholder', 'sprint',
+    'standup', 'backlog', 'roadmap', 'pipeline', 'action items'
+]
+
+
+def make_message(rng, words, density):
+    tokens = []
+    while len(tokens) < words:
+        if rng.random() < density:
+            tokens.append(rng.choice(BUSINESS_JARGON))
+        else:
+            tokens.append(rng.choice(FILLER_WORDS))
+    text = ' '.join(tokens)
+    # Break long messages into sentences so they read like real write-ups
+    return '. '.join(text[i:i + 120] for i in range(0, len(text), 120)) + '.'
+
+
+def generate_corpus(messages_per_cell, seed=0):
+    """
+    Synthetic chat messages for every length bucket and jargon density.
+
+    Returns a list of (length_bucket, density, text), identical for a given
+    seed.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for bucket, (low, high) in LENGTH_BUCKETS.items():
+        for density in JARGON_DENSITIES:
+            for _ in range(messages_per_cell):
+                corpus.append((bucket, density, make_message(rng, rng.randint(low, high), density)))
+    return corpus
+
+
+def generate_glossary(size, seed=0):
+    """Organization glossary of `size` made-up product names and acronyms"""
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    glossary = []
+    for i in range(size):
+        if i % 3 == 0:
+            term = ''.join(rng.choice(letters) for _ in range(3)).upper()
+        else:
+            term = f"project {''.join(rng.choice(letters) for _ in range(rng.randint(4, 9)))}"
+        glossary.append({'term': f'{term}{i}', 'plainLanguage': f'plain meaning {i}'})
+    return glossary
+
+
+def sprinkle_glossary_terms(texts, glossary, seed=0):
+    """Append a few glossary terms to each text so matching finds something"""
+    if not glossary:
+        return list(texts)
+    rng = random.Random(seed)
+    return [
+        f"{text} {' and '.join(rng.choice(glossary)['term'] for _ in range(3))}"
+        for text in texts
+    ]
+
+
+def build_tiny_model(path, texts, seed=0):
+    """
+    Save a small randomly initialised RoBERTa with a tokenizer trained on
+    `texts` to `path`, so the model paths can be timed without downloads.
+    """
+    from tokenizers import ByteLevelBPETokenizer
+    from tokenizers.processors import RobertaProcessing
+    from transformers import RobertaConfig, RobertaForTokenClassification, RobertaTokenizerFast
+
+    special_tokens = ['<s>', '<pad>', '</s>', '<unk>', '<mask>']
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(texts, vocab_size=2000, min_frequency=1, special_tokens=special_tokens)
+    bpe._tokenizer.post_processor = RobertaProcessing(('</s>', 2), ('<s>', 0), trim_offsets=True)
+    os.makedirs(path, exist_ok=True)
+    bpe.save(os.path.join(path, 'tokenizer.json'))
+
+    tokenizer = RobertaTokenizerFast(
+        tokenizer_file=os.path.join(path, 'tokenizer.json'),
+        bos_token='<s>', eos_token='</s>', pad_token='<pad>',
+        unk_token='<unk>', mask_token='<mask>'
+    )
+    tokenizer.save_pretrained(path)
+
+    torch.manual_seed(seed)
+    config = RobertaConfig(
+        vocab_size=len(tokenizer), hidden_size=64, num_hidden_layers=2,
+        num_attention_heads=2, intermediate_size=128, max_position_embeddings=514,
+        pad_token_id=tokenizer.pad_token_id, num_labels=2
+    )
+    RobertaForTokenClassification(config).eval().save_pretrained(path, safe_serialization=True)
+
+
+def time_calls(fn, items, repeat=1):
+    """Latency in ms of calling `fn` on each item, `repeat` times over"""
+    fn(items[0])
+    latencies = []
+    for _ in range(repeat):
+        for item in items:
+            started = time.perf_counter()
+            fn(item)
+            latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def by_length_bucket(corpus):
+    texts = {}
+    for bucket, _, text in corpus:
+        texts.setdefault(bucket, []).append(text)
+    return texts
+
+
+def bench_rule_based(service, corpus, repeat):
+    return {
+        bucket: summarize_latency(time_calls(service.detect_jargon_rule_based, texts, repeat))
+        for bucket, texts in by_length_bucket(corpus).items()
+    }
+
+
+def bench_glossary(corpus, repeat, seed):
+    from matcher import GlossaryMatcher
+
+    texts = by_length_bucket(corpus)['medium']
+    report = {}
+    for size in GLOSSARY_SIZES:
+        glossary = generate_glossary(size, seed)
+        started = time.perf_counter()
+        matcher = GlossaryMatcher(glossary)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        latency = summarize_latency(time_calls(
+            matcher.find_spans, sprinkle_glossary_terms(texts, glossary, seed), repeat
+        ))
+        latency['build_ms'] = build_ms
+        report[str(size)] = latency
+    return report
+
+
+def bench_model(service, corpus, repeat):
+    from inference import detect_jargon_with_model
+
+    def detect(text):
+        return detect_jargon_with_model(
+            text, service.jargon_tokenizer, service.jargon_model, service.device,
+            window=service.WINDOW_TOKENS, stride=service.WINDOW_STRIDE
+        )
+
+    report = {
+        bucket: summarize_latency(time_calls(detect, texts, repeat))
+        for bucket, texts in by_length_bucket(corpus).items()
+    }
+
+    texts = [text for _, _, text in corpus]
+    started = time.perf_counter()
+    service.run_model(texts)
+    elapsed = time.perf_counter() - started
+    report['batched'] = {'texts': len(texts), 'texts_per_second': len(texts) / elapsed}
+    return report
+
+
+def bench_endpoint(service, corpus, requests_per_level, concurrency_levels):
+    """Throughput and latency of POST /detect-jargon through the Flask test client"""
+    texts = [text for _, _, text in corpus]
+    report = {}
+
+    for concurrency in concurrency_levels:
+        service.result_cache.clear()
+        local = threading.local()
+
+        def post(i):
+            if not hasattr(local, 'client'):
+                local.client = service.app.test_client()
+            # A distinct suffix keeps every request out of the result cache
+            body = {'text': f'{texts[i % len(texts)]} #{concurrency}-{i}'}
+            started = time.perf_counter()
+            response = local.client.post('/detect-jargon', json=body)
+            latency = (time.perf_counter() - started) * 1000
+            return latency, response.status_code, response.get_json().get('degraded', False)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(post, range(requests_per_level)))
+        elapsed = time.perf_counter() - started
+
+        latency = summarize_latency([outcome[0] for outcome in outcomes])
+        latency['requests_per_second'] = requests_per_level / elapsed
+        latency['errors'] = sum(outcome[1] != 200 for outcome in outcomes)
+        latency['degraded'] = sum(bool(outcome[2]) for outcome in outcomes)
+        report[str(concurrency)] = latency
+
+    return report
+
+
+def find_regressions(baseline, current, tolerance):
+    """
+    Latency figures in `current` more than `tolerance` (a fraction) slower
+    than the same figure in `baseline`, as a list of (path, old, new).
+    """
+    regressions = []
+
+    def walk(old, new, path):
+        for key, value in new.items():
+            if key not in old:
+                continue
+            if isinstance(value, dict) and isinstance(old[key], dict):
+                walk(old[key], value, path + (key,))
+            elif key.endswith('_ms') and key != 'build_ms' and old[key] > 0:
+                if value > old[key] * (1 + tolerance):
+                    regressions.append(('.'.join(path + (key,)), old[key], value))
+
+    walk(baseline.get('results', {}), current.get('results', {}), ())
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ML service hot paths')
+    parser.add_argument('--messages', type=int, default=20,
+                        help='Messages per length bucket and jargon density')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Times to repeat each corpus for stable timings')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Requests per concurrency level for the endpoint benchmark')
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--model-path', default=None,
+                        help='Model directory to benchmark instead of a tiny random model')
+    parser.add_argument('--threads', type=int, default=None, help='PyTorch intra-op threads')
+    parser.add_argument('--output', default=None, help='Also write the report here')
+    parser.add_argument('--baseline', default=None,
+                        help='Earlier report to compare with; exits non-zero on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed slowdown against the baseline, as a fraction')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    corpus = generate_corpus(args.messages, args.seed)
+
+    model_dir = args.model_path
+    if model_dir is None:
+        model_dir = tempfile.mkdtemp(prefix='jargon-bench-')
+        build_tiny_model(model_dir, [text for _, _, text in corpus], args.seed)
+
+    # The service is imported only now so it loads the benchmark model
+    os.environ['JARGON_MODEL_PATH'] = model_dir
+    os.environ['JARGON_TOKENIZER_PATH'] = model_dir
+    os.environ['JARGON_LAZY_LOAD'] = '0'
+    import app as service
+
+    if not service.MODEL_LOADED:
+        sys.exit(f'Could not load a model from {model_dir}')
+
+    report = {
+        'config': {
+            'seed': args.seed,
+            'messages': len(corpus),
+            'repeat': args.repeat,
+            'model': args.model_path or 'tiny-random-roberta',
+            'torch_threads': torch.get_num_threads(),
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'machine': platform.machine()
+        },
+        'results': {
+            'rule_based': bench_rule_based(service, corpus, args.repeat),
+            'glossary': bench_glossary(corpus, args.repeat, args.seed),
+            'model': bench_model(service, corpus, args.repeat),
+            'endpoint': bench_endpoint(
+                service, corpus, args.requests,
+                [int(level) for level in args.concurrency.split(',') if level]
+            )
+        }
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(json.load(f), report, args.tolerance)
+        for path, old, new in regressions:
+            print(f'Regression in {path}: {old:.3f} ms -> {new:.3f} ms', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import re
+
+_WORD = re.compile(r"[A-Za-z0-9][\w'&/.-]*[\w&]|[A-Za-z0-9]")
+
+# Word shapes that plain chat rarely uses but jargon often does
+_ACRONYM = re.compile(r'[A-Z][A-Z0-9&]+s?')                       # KPI, KPIs, B2B, R&D
+_MIXED_ALNUM = re.compile(r'(?=.*[A-Za-z])(?=.*\d)[\w&/.-]+')     # Q4, 10x, P0
+_INNER_CAPS = re.compile(r'[A-Za-z][a-z]+[A-Z]\w*|[a-z]+[A-Z]\w*')  # camelCase, PowerPoint
+_COMPOUND = re.compile(r'\w+[-/]\w+[\w/-]*')                      # go-to-market, low-hanging
+_JARGON_SUFFIX = re.compile(r'\w{4,}(?:ize|ise|ized|ised|izing|ising|ization|isation|ability)', re.I)
+
+# Shapes of plain words that the patterns above would otherwise flag
+_PLAIN_ACRONYMS = {'OK', 'AM', 'PM', 'ID', 'TV', 'US', 'UK', 'EU', 'OKS'}
+_PLAIN_NUMBERISH = re.compile(r'\d{1,2}(?::\d{2})?(?:am|pm)|\d+(?:st|nd|rd|th|s)|\d+[.:/-]\d+', re.I)
+
+LONG_WORD = 13
+
+
+def is_suspicious(word):
+    """Whether a word's shape suggests jargon the cheap stage may not know"""
+    if word.upper() in _PLAIN_ACRONYMS or _PLAIN_NUMBERISH.fullmatch(word):
+        return False
+    return bool(
+        _ACRONYM.fullmatch(word) or
+        _MIXED_ALNUM.fullmatch(word) or
+        _INNER_CAPS.fullmatch(word) or
+        _COMPOUND.fullmatch(word) or
+        _JARGON_SUFFIX.fullmatch(word) or
+        len(word) >= LONG_WORD
+    )
+
+
+def needs_model(text, cheap_spans, max_words=12, min_suspicious=1):
+    """
+    Gate of the detection cascade: whether the transformer should run.
+
+    Texts longer than `max_words` always go to the model. Shorter ones are
+    settled by the cheap stage unless at least `min_suspicious` words that
+    it didn't already flag (`cheap_spans`, from the rule-based and glossary
+    matchers) look like jargon.
+    """
+    words = _WORD.findall(text)
+    if len(words) > max_words:
+        return True
+
+    suspicious = 0
+    for match in _WORD.finditer(text):
+        if any(span['start'] <= match.start() < span['end'] for span in cheap_spans):
+            continue
+        if is_suspicious(match.group()):
+            suspicious += 1
+            if suspicious >= min_suspicious:
+                return True
+    return False
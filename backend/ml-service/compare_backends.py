@@ -0,0 +1,145 @@
+import argparse
+import json
+import statistics
+import time
+
+import torch
+from transformers import RobertaTokenizerFast
+
+from backends import BACKENDS, load_backend
+from inference import detect_jargon_batch_with_model, detect_jargon_with_model
+
+
+def load_corpus(path=None, repeat=1):
+    """Sample messages: one per line from `path`, or the training examples"""
+    if path:
+        with open(path, encoding='utf-8') as f:
+            texts = [line.rstrip('\n') for line in f if line.strip()]
+    else:
+        from train_jargon_model import create_training_data
+        texts = [text for text, _ in create_training_data()]
+    return texts * repeat
+
+
+def time_backend(texts, tokenizer, model, device):
+    """Score each text on its own, returning (spans per text, latencies in ms)"""
+    results = []
+    latencies = []
+
+    # Warm up so one-off initialisation isn't counted
+    detect_jargon_with_model(texts[0], tokenizer, model, device)
+
+    for text in texts:
+        started = time.perf_counter()
+        results.append(detect_jargon_with_model(text, tokenizer, model, device))
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    return results, latencies
+
+
+def batch_backend(texts, tokenizer, model, device, batch_size=16, window=512, stride=128):
+    """
+    Score the texts in padded, length-bucketed batches of `batch_size`, as
+    the service's micro-batcher does
+    """
+    results = []
+    for start in range(0, len(texts), batch_size):
+        results.extend(detect_jargon_batch_with_model(
+            texts[start:start + batch_size], tokenizer, model, device,
+            batch_size=batch_size, window=window, stride=stride
+        ))
+    return results
+
+
+def span_agreement(reference, candidate):
+    """Compare two backends' spans over the same texts"""
+    reference_spans = {
+        (i, s['start'], s['end']) for i, spans in enumerate(reference) for s in spans
+    }
+    candidate_spans = {
+        (i, s['start'], s['end']) for i, spans in enumerate(candidate) for s in spans
+    }
+    matched = len(reference_spans & candidate_spans)
+    precision = matched / len(candidate_spans) if candidate_spans else 1.0
+    recall = matched / len(reference_spans) if reference_spans else 1.0
+
+    exact = sum(
+        [(s['start'], s['end']) for s in a] == [(s['start'], s['end']) for s in b]
+        for a, b in zip(reference, candidate)
+    )
+
+    return {
+        'exact_match_rate': exact / len(reference) if reference else 1.0,
+        'span_precision': precision,
+        'span_recall': recall,
+        'span_f1': (2 * precision * recall / (precision + recall)) if precision + recall else 0.0
+    }
+
+
+def summarize_latency(latencies):
+    ordered = sorted(latencies)
+    return {
+        'mean_ms': statistics.fmean(ordered),
+        'p50_ms': ordered[len(ordered) // 2],
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'p99_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare jargon model backends against fp32 torch'
+    )
+    parser.add_argument('--model-path', default='./jargon_model')
+    parser.add_argument('--tokenizer-path', default='./jargon_model')
+    parser.add_argument('--onnx-path', default=None)
+    parser.add_argument('--backends', default=','.join(BACKENDS[1:]),
+                        help='Comma-separated backends to compare with torch')
+    parser.add_argument('--corpus', default=None,
+                        help='Text file with one message per line')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Times to repeat the corpus for stable timings')
+    parser.add_argument('--batch-size', type=int, default=16,
+                        help='Batch size of the batched pass (JARGON_BATCH_MAX_SIZE in the service)')
+    parser.add_argument('--output', default=None, help='Also write the report here')
+    args = parser.parse_args()
+
+    cpu = torch.device('cpu')
+    tokenizer = RobertaTokenizerFast.from_pretrained(args.tokenizer_path)
+    texts = load_corpus(args.corpus, args.repeat)
+
+    reference_model, _ = load_backend('torch', args.model_path, cpu)
+    reference, reference_latencies = time_backend(texts, tokenizer, reference_model, cpu)
+    reference_batched = batch_backend(texts, tokenizer, reference_model, cpu, args.batch_size)
+    # Agreement of batched scoring, as served, with each text scored alone;
+    # int8 activation scales depend on the whole batch, so it may differ
+    report = {
+        'messages': len(texts),
+        'torch': {
+            'latency': summarize_latency(reference_latencies),
+            'batch_consistency': span_agreement(reference, reference_batched)
+        }
+    }
+
+    for name in filter(None, args.backends.split(',')):
+        model, device = load_backend(name, args.model_path, cpu, args.onnx_path)
+        results, latencies = time_backend(texts, tokenizer, model, device)
+        latency = summarize_latency(latencies)
+        latency['speedup_vs_torch'] = report['torch']['latency']['mean_ms'] / latency['mean_ms']
+        batched = batch_backend(texts, tokenizer, model, device, args.batch_size)
+        report[name] = {
+            'latency': latency,
+            'agreement': span_agreement(reference, results),
+            'batched_agreement': span_agreement(reference_batched, batched),
+            'batch_consistency': span_agreement(results, batched)
+        }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+import gzip
+import hashlib
+import json
+import random
+
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+
+from token_cache import align_token_labels_batch
+
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def parse_example(line):
+    """
+    Parse one JSONL line into (text, [(start, end, label), ...]).
+
+    Lines look like {"text": "...", "spans": [[start, end, "JARGON"], ...]};
+    spans may also be objects with start, end and an optional label. Returns
+    None when the line isn't a valid example: malformed JSON, a non-string
+    text, or a span that is empty or falls outside the text.
+    """
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict) or not isinstance(record.get('text'), str):
+        return None
+
+    text = record['text']
+    spans = []
+    for span in record.get('spans') or []:
+        if isinstance(span, dict):
+            start, end, label = span.get('start'), span.get('end'), span.get('label', 'JARGON')
+        elif isinstance(span, (list, tuple)) and len(span) in (2, 3):
+            start, end, label = span[0], span[1], span[2] if len(span) == 3 else 'JARGON'
+        else:
+            return None
+        if (not isinstance(start, int) or not isinstance(end, int) or
+                isinstance(start, bool) or isinstance(end, bool) or
+                not 0 <= start < end <= len(text)):
+            return None
+        spans.append((start, end, label))
+    return text, spans
+
+
+def split_of(text, val_fraction, seed=0):
+    """
+    'val' or 'train' for a text, from a hash of it.
+
+    The split is the same on every run and in every worker without keeping
+    any state, and copies of one message always land on the same side.
+    """
+    digest = hashlib.blake2b(f'{seed}:{text}'.encode('utf-8'), digest_size=8).digest()
+    return 'val' if int.from_bytes(digest, 'big') / 2 ** 64 < val_fraction else 'train'
+
+
+class StreamingJargonDataset(IterableDataset):
+    """
+    Labelled examples streamed from JSONL files, tokenized as they are read.
+
+    Lines are dealt round-robin to DataLoader workers, so each line is
+    parsed by exactly one worker, and only the examples of `split` are
+    kept. Examples are tokenized `chunk_size` at a time and returned
+    unpadded, for DynamicPaddingCollator. With `shuffle_buffer`, examples
+    are shuffled within a buffer of that many, differently each epoch (see
+    `set_epoch`). Nothing beyond the buffer is held in memory.
+    """
+
+    def __init__(self, paths, tokenizer, split='train', val_fraction=0.1, max_length=128,
+                 chunk_size=256, shuffle_buffer=0, seed=0):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.tokenizer = tokenizer
+        self.split = split
+        self.val_fraction = val_fraction
+        self.max_length = max_length
+        self.chunk_size = chunk_size
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.epoch = 0
+        self._length = None
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def examples(self, worker_id=0, num_workers=1):
+        """Valid (text, spans) examples of this split for one worker's shard"""
+        line_number = -1
+        skipped = 0
+        for path in self.paths:
+            with open_text(path) as f:
+                for line in f:
+                    line_number += 1
+                    if line_number % num_workers != worker_id or not line.strip():
+                        continue
+                    example = parse_example(line)
+                    if example is None:
+                        skipped += 1
+                        continue
+                    if split_of(example[0], self.val_fraction, self.seed) == self.split:
+                        yield example
+        if skipped:
+            print(f"Skipped {skipped} invalid examples (worker {worker_id})")
+
+    def __len__(self):
+        # Counting takes a pass over the files without tokenizing
+        if self._length is None:
+            self._length = sum(1 for _ in self.examples())
+        return self._length
+
+    def _encode(self, chunk):
+        texts = [text for text, _ in chunk]
+        encoding = self.tokenizer(
+            texts,
+            max_length=self.max_length,
+            truncation=True,
+            return_offsets_mapping=True
+        )
+        labels = torch.from_numpy(align_token_labels_batch(
+            texts, [spans for _, spans in chunk], encoding['offset_mapping']
+        ))
+
+        start = 0
+        for ids in encoding['input_ids']:
+            ids = torch.tensor(ids)
+            yield {
+                'input_ids': ids,
+                'attention_mask': torch.ones_like(ids),
+                'labels': labels[start:start + len(ids)]
+            }
+            start += len(ids)
+
+    def _encoded(self, worker_id, num_workers):
+        chunk = []
+        for example in self.examples(worker_id, num_workers):
+            chunk.append(example)
+            if len(chunk) == self.chunk_size:
+                yield from self._encode(chunk)
+                chunk = []
+        if chunk:
+            yield from self._encode(chunk)
+
+    def __iter__(self):
+        worker = get_worker_info()
+        worker_id, num_workers = (worker.id, worker.num_workers) if worker else (0, 1)
+        items = self._encoded(worker_id, num_workers)
+        if not self.shuffle_buffer:
+            return items
+        return self._shuffled(items, random.Random(f'{self.seed}:{self.epoch}:{worker_id}'))
+
+    def _shuffled(self, items, rng):
+        buffer = []
+        for item in items:
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(item)
+                continue
+            index = rng.randrange(len(buffer))
+            yield buffer[index]
+            buffer[index] = item
+        rng.shuffle(buffer)
+        yield from buffer
@@ -0,0 +1,250 @@
+import argparse
+import json
+import os
+import tempfile
+
+import torch
+import torch.nn.functional as F
+from tqdm import tqdm
+from transformers import RobertaForTokenClassification, RobertaTokenizerFast
+
+from backends import load_torch_model
+from compare_backends import span_agreement, summarize_latency, time_backend
+
+
+def student_config(teacher_config, layers, hidden_size, heads, intermediate_size):
+    """Teacher's config with a smaller transformer; the vocabulary is shared"""
+    config = teacher_config.__class__.from_dict(teacher_config.to_dict())
+    config.num_hidden_layers = layers
+    config.hidden_size = hidden_size
+    config.num_attention_heads = heads
+    config.intermediate_size = intermediate_size
+    return config
+
+
+def build_student(teacher, layers, hidden_size, heads, intermediate_size):
+    """
+    Smaller token classifier to distil `teacher` into.
+
+    When the hidden size matches the teacher's, the student starts from the
+    teacher's embeddings and an evenly spaced subset of its layers, which
+    trains much faster than a random start; otherwise it is randomly
+    initialised.
+    """
+    config = student_config(teacher.config, layers, hidden_size, heads, intermediate_size)
+    student = RobertaForTokenClassification(config)
+
+    if hidden_size == teacher.config.hidden_size and intermediate_size == teacher.config.intermediate_size:
+        student.roberta.embeddings.load_state_dict(teacher.roberta.embeddings.state_dict())
+        step = teacher.config.num_hidden_layers / layers
+        for i, layer in enumerate(student.roberta.encoder.layer):
+            layer.load_state_dict(teacher.roberta.encoder.layer[int(i * step)].state_dict())
+        student.classifier.load_state_dict(teacher.classifier.state_dict())
+
+    return student
+
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature=2.0, alpha=0.5):
+    """
+    Blend of KL divergence to the teacher's softened token distributions and
+    cross-entropy on the gold labels, over tokens that carry a label.
+
+    `alpha` weights the teacher term; the KL term is scaled by the squared
+    temperature so its gradients keep their size as the temperature changes.
+    """
+    mask = labels != -100
+    student_logits = student_logits[mask]
+    teacher_logits = teacher_logits[mask]
+    if student_logits.numel() == 0:
+        return student_logits.sum()
+
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=-1),
+        F.softmax(teacher_logits / temperature, dim=-1),
+        reduction='batchmean'
+    ) * temperature ** 2
+    hard = F.cross_entropy(student_logits, labels[mask])
+    return alpha * soft + (1 - alpha) * hard
+
+
+def distill(student, teacher, train_loader, val_loader, device, output_dir,
+            epochs=3, lr=1e-4, temperature=2.0, alpha=0.5):
+    """Train `student` on the teacher's logits, saving the best to `output_dir`"""
+    from transformers import get_linear_schedule_with_warmup
+
+    optimizer = torch.optim.AdamW(student.parameters(), lr=lr)
+    total_steps = len(train_loader) * epochs
+    scheduler = get_linear_schedule_with_warmup(
+        optimizer,
+        num_warmup_steps=int(0.1 * total_steps),
+        num_training_steps=total_steps
+    )
+    teacher.eval()
+    best_val_loss = float('inf')
+
+    def losses(batch):
+        input_ids = batch['input_ids'].to(device)
+        attention_mask = batch['attention_mask'].to(device)
+        with torch.no_grad():
+            teacher_logits = teacher(input_ids=input_ids, attention_mask=attention_mask).logits
+        student_logits = student(input_ids=input_ids, attention_mask=attention_mask).logits
+        return distillation_loss(
+            student_logits, teacher_logits, batch['labels'].to(device), temperature, alpha
+        )
+
+    for epoch in range(epochs):
+        for target in (train_loader.batch_sampler, train_loader.dataset):
+            if hasattr(target, 'set_epoch'):
+                target.set_epoch(epoch)
+
+        student.train()
+        train_loss, train_batches = 0, 0
+        train_bar = tqdm(train_loader, desc=f'Epoch {epoch+1}/{epochs} [Distil]')
+        for batch in train_bar:
+            optimizer.zero_grad()
+            loss = losses(batch)
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(student.parameters(), 1.0)
+            optimizer.step()
+            scheduler.step()
+            train_loss += loss.item()
+            train_batches += 1
+            train_bar.set_postfix({'loss': loss.item()})
+
+        student.eval()
+        val_loss, val_batches = 0, 0
+        with torch.no_grad():
+            for batch in tqdm(val_loader, desc=f'Epoch {epoch+1}/{epochs} [Val]'):
+                val_loss += losses(batch).item()
+                val_batches += 1
+
+        avg_val_loss = val_loss / max(val_batches, 1)
+        print(f'\nEpoch {epoch+1}:')
+        print(f'  Train Loss: {train_loss / max(train_batches, 1):.4f}')
+        print(f'  Val Loss: {avg_val_loss:.4f}')
+
+        if avg_val_loss < best_val_loss:
+            best_val_loss = avg_val_loss
+            student.save_pretrained(output_dir, safe_serialization=True)
+            print(f'Saved best student to {output_dir}!')
+
+
+def evaluation_texts(corpus, val_fraction, tokenizer, limit):
+    """Validation messages to compare student and teacher on"""
+    if corpus:
+        from corpus import StreamingJargonDataset
+
+        dataset = StreamingJargonDataset(corpus, tokenizer, split='val', val_fraction=val_fraction)
+        texts = []
+        for text, _ in dataset.examples():
+            texts.append(text)
+            if len(texts) == limit:
+                break
+        return texts
+
+    from train_jargon_model import create_training_data
+    return [text for text, _ in create_training_data()][:limit]
+
+
+def count_parameters(model):
+    return sum(parameter.numel() for parameter in model.parameters())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Distil the fine-tuned jargon model into a smaller, faster student'
+    )
+    parser.add_argument('--teacher', default='./jargon_model',
+                        help='Fine-tuned model directory (or legacy .pt weights)')
+    parser.add_argument('--tokenizer-path', default=None,
+                        help='Tokenizer directory (default: the teacher directory, else ./jargon_model)')
+    parser.add_argument('--random-teacher', action='store_true',
+                        help='Use a tiny randomly initialised teacher, to try the pipeline offline')
+    parser.add_argument('--output', default='./jargon_model_student')
+    parser.add_argument('--layers', type=int, default=4)
+    parser.add_argument('--hidden-size', type=int, default=None,
+                        help="Student hidden size (default: the teacher's)")
+    parser.add_argument('--heads', type=int, default=None)
+    parser.add_argument('--intermediate-size', type=int, default=None)
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--lr', type=float, default=1e-4)
+    parser.add_argument('--temperature', type=float, default=2.0)
+    parser.add_argument('--alpha', type=float, default=0.5,
+                        help='Weight of the teacher term against the gold labels')
+    parser.add_argument('--corpus', nargs='+', default=None,
+                        help='JSONL training files, as for train_jargon_model.py --corpus')
+    parser.add_argument('--val-fraction', type=float, default=0.2)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--eval-messages', type=int, default=500,
+                        help='Validation messages used for the agreement and latency report')
+    parser.add_argument('--report', default=None, help='Also write the report here')
+    args = parser.parse_args()
+
+    from train_jargon_model import in_memory_loaders, streaming_loaders
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    cpu = torch.device('cpu')
+
+    teacher_path = args.teacher
+    if args.random_teacher:
+        from benchmark import build_tiny_model, generate_corpus
+        teacher_path = tempfile.mkdtemp(prefix='jargon-teacher-')
+        build_tiny_model(teacher_path, [text for _, _, text in generate_corpus(20)])
+
+    tokenizer_path = args.tokenizer_path or (
+        teacher_path if os.path.isdir(teacher_path) else './jargon_model'
+    )
+    print(f"Loading teacher from {teacher_path}...")
+    tokenizer = RobertaTokenizerFast.from_pretrained(tokenizer_path)
+    teacher = load_torch_model(teacher_path, device)
+
+    hidden_size = args.hidden_size or teacher.config.hidden_size
+    heads = args.heads or teacher.config.num_attention_heads
+    intermediate_size = args.intermediate_size or teacher.config.intermediate_size
+    student = build_student(teacher, args.layers, hidden_size, heads, intermediate_size).to(device)
+    print(f"Teacher parameters: {count_parameters(teacher):,}")
+    print(f"Student parameters: {count_parameters(student):,}")
+
+    if args.corpus:
+        train_loader, val_loader = streaming_loaders(
+            args.corpus, tokenizer, args.val_fraction, args.workers
+        )
+    else:
+        train_loader, val_loader = in_memory_loaders(tokenizer, args.val_fraction)
+
+    distill(student, teacher, train_loader, val_loader, device, args.output,
+            epochs=args.epochs, lr=args.lr, temperature=args.temperature, alpha=args.alpha)
+    tokenizer.save_pretrained(args.output)
+
+    # Compare the saved student with the teacher on CPU, one message at a time,
+    # as the service runs them
+    texts = evaluation_texts(args.corpus, args.val_fraction, tokenizer, args.eval_messages)
+    teacher = teacher.to(cpu)
+    student = load_torch_model(args.output, cpu)
+    teacher_spans, teacher_latencies = time_backend(texts, tokenizer, teacher, cpu)
+    student_spans, student_latencies = time_backend(texts, tokenizer, student, cpu)
+
+    teacher_latency = summarize_latency(teacher_latencies)
+    student_latency = summarize_latency(student_latencies)
+    student_latency['speedup_vs_teacher'] = teacher_latency['mean_ms'] / student_latency['mean_ms']
+    report = {
+        'messages': len(texts),
+        'teacher': {'parameters': count_parameters(teacher), 'latency': teacher_latency},
+        'student': {
+            'path': args.output,
+            'parameters': count_parameters(student),
+            'latency': student_latency,
+            'agreement': span_agreement(teacher_spans, student_spans)
+        }
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(output + '\n')
+    print(f"Serve the student with JARGON_MODEL_PATH={args.output} JARGON_TOKENIZER_PATH={args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+import argparse
+
+import torch
+
+from backends import default_onnx_path, export_onnx, load_torch_model
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Export the fine-tuned jargon model to ONNX for the onnx backend'
+    )
+    parser.add_argument('--model-path', default='./jargon_model',
+                        help='Model directory (or legacy .pt weights) from train_jargon_model.py')
+    parser.add_argument('--output', default=None,
+                        help='Where to write the ONNX graph (default: model.onnx in the model directory)')
+    parser.add_argument('--opset', type=int, default=17, help='ONNX opset version')
+    args = parser.parse_args()
+
+    print(f"Loading model from {args.model_path}...")
+    model = load_torch_model(args.model_path, torch.device('cpu'))
+
+    output = args.output or default_onnx_path(args.model_path)
+    print(f"Exporting to {output}...")
+    export_onnx(model, output, opset_version=args.opset)
+    print("Export complete! Serve it with JARGON_BACKEND=onnx")
+
+
+if __name__ == '__main__':
+    main()
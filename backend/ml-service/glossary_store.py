@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from matcher import GlossaryMatcher, glossary_fingerprint
+
+
+def file_stamp(path):
+    """Changes whenever the file is replaced, even within a clock tick"""
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns
+
+
+class RegisteredGlossary:
+    """An uploaded glossary together with its compiled matcher"""
+
+    def __init__(self, glossary_id, version, entries, stamp=None):
+        self.glossary_id = glossary_id
+        self.version = version
+        self.entries = entries
+        self.stamp = stamp
+        self.fingerprint = glossary_fingerprint(entries)
+        self.matcher = GlossaryMatcher(entries)
+
+    def describe(self):
+        return {
+            'glossary_id': self.glossary_id,
+            'version': self.version,
+            'terms': len(self.matcher.entries),
+            'fingerprint': self.fingerprint
+        }
+
+
+class GlossaryStore:
+    """
+    Glossaries registered by id so detection requests can reference them.
+
+    Matchers are compiled when a glossary is uploaded, which keeps glossary
+    parsing and matcher construction off the per-request path.
+
+    With `directory`, uploads are also written there and every process
+    sharing the directory serves them: a process that hasn't seen the
+    latest upload of a glossary loads and compiles it on first use. This is
+    how the forked workers of serve.py agree on their glossaries.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._glossaries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._glossaries)
+
+    def _path(self, glossary_id):
+        name = hashlib.sha256(str(glossary_id).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + '.json')
+
+    def _write(self, glossary_id, version, entries):
+        """Write a glossary file atomically; returns its stamp"""
+        path = self._path(glossary_id)
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix='.upload-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'glossary_id': glossary_id, 'version': version, 'entries': entries}, f)
+        os.replace(temporary, path)
+        return file_stamp(path)
+
+    def _refresh(self, glossary_id, registered):
+        """The shared directory's copy of a glossary if it differs from ours"""
+        path = self._path(glossary_id)
+        try:
+            stamp = file_stamp(path)
+        except FileNotFoundError:
+            if registered is not None:
+                with self._lock:
+                    self._glossaries.pop(glossary_id, None)
+            return None
+        if registered is not None and registered.stamp == stamp:
+            return registered
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        registered = RegisteredGlossary(glossary_id, data['version'], data['entries'], stamp)
+        with self._lock:
+            self._glossaries[glossary_id] = registered
+        return registered
+
+    def put(self, glossary_id, version, entries):
+        """Register or replace the glossary stored under `glossary_id`"""
+        stamp = self._write(glossary_id, version, entries) if self.directory else None
+        registered = RegisteredGlossary(glossary_id, version, entries, stamp)
+        with self._lock:
+            self._glossaries[glossary_id] = registered
+        return registered
+
+    def get(self, glossary_id, version=None):
+        """Return the registered glossary, or None if missing or stale"""
+        registered = self._glossaries.get(glossary_id)
+        if self.directory:
+            registered = self._refresh(glossary_id, registered)
+        if registered is None:
+            return None
+        if version is not None and str(version) != str(registered.version):
+            return None
+        return registered
+
+    def delete(self, glossary_id):
+        deleted = False
+        if self.directory:
+            try:
+                os.remove(self._path(glossary_id))
+                deleted = True
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            return self._glossaries.pop(glossary_id, None) is not None or deleted
@@ -0,0 +1,116 @@
+import re
+import threading
+from collections import OrderedDict
+
+# A sentence ends after terminal punctuation followed by whitespace, or at a
+# line break
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def split_sentences(text):
+    """Split text into (start, end) sentence ranges, skipping blank stretches"""
+    ranges = []
+    start = 0
+
+    for match in _SENTENCE_BREAK.finditer(text):
+        if text[start:match.start()].strip():
+            ranges.append((start, match.start()))
+        start = match.end()
+
+    if text[start:].strip():
+        ranges.append((start, len(text)))
+
+    # Leading whitespace is not part of the sentence the model sees
+    return [
+        (start + len(text[start:end]) - len(text[start:end].lstrip()), end)
+        for start, end in ranges
+    ]
+
+
+def rebase_spans(spans, offset, text):
+    """Shift sentence-relative spans to positions in the full text"""
+    rebased = []
+    for span in spans:
+        span = dict(span, start=span['start'] + offset, end=span['end'] + offset)
+        span['term'] = text[span['start']:span['end']]
+        rebased.append(span)
+    return rebased
+
+
+def detect_incremental(text, previous, detect_many):
+    """
+    Detect jargon sentence by sentence, reusing predictions for unchanged ones.
+
+    Args:
+        text: The full, current draft
+        previous: Dict of sentence text to sentence-relative spans from the
+            draft's previous revision
+        detect_many: Callable scoring a list of sentences, returning
+            (list of spans, degraded_reason) like app.detect_spans_many
+
+    Returns:
+        Tuple of (spans in full-text offsets, dict of sentence predictions to
+        keep for the next revision, number of sentences rescored,
+        degraded_reason)
+    """
+    ranges = split_sentences(text)
+    sentences = [text[start:end] for start, end in ranges]
+
+    changed = list(dict.fromkeys(s for s in sentences if s not in previous))
+    predictions = {s: previous[s] for s in sentences if s in previous}
+    degraded_reason = None
+
+    if changed:
+        scored, degraded_reason = detect_many(changed)
+        fresh = dict(zip(changed, scored))
+    else:
+        fresh = {}
+
+    spans = []
+    for (start, _), sentence in zip(ranges, sentences):
+        sentence_spans = predictions.get(sentence)
+        if sentence_spans is None:
+            sentence_spans = fresh[sentence]
+        spans.extend(rebase_spans(sentence_spans, start, text))
+
+    # Stand-in rule-based predictions aren't worth keeping
+    if degraded_reason is None:
+        predictions.update(fresh)
+
+    return spans, predictions, len(changed), degraded_reason
+
+
+class DraftSessions:
+    """
+    LRU store of per-draft sentence predictions for incremental detection.
+
+    Each session keeps only the sentences of its latest revision, tagged with
+    the model version that produced them so a model change starts afresh.
+    """
+
+    def __init__(self, max_sessions=1000):
+        self.max_sessions = max(1, int(max_sessions))
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id, model_version):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[0] != model_version:
+                return {}
+            self._sessions.move_to_end(session_id)
+            return entry[1]
+
+    def put(self, session_id, model_version, predictions):
+        with self._lock:
+            self._sessions[session_id] = (model_version, predictions)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def discard(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
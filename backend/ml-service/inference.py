@@ -0,0 +1,295 @@
+import time
+
+import torch
+
+MAX_LENGTH = 512
+
+
+def _make_span(text, start, end, confidence):
+    term = text[start:end]
+    return {
+        'start': start,
+        'end': end,
+        'confidence': confidence,
+        'term': term,
+        'suggestion': f'Consider simplifying "{term}"'
+    }
+
+
+def extract_spans_batch(texts, predictions, confidences, offset_mapping):
+    """
+    Turn per-token predictions for a batch of texts into jargon spans.
+
+    A span is a run of consecutive jargon tokens, skipping special and padding
+    tokens (offset (0, 0)). It covers the characters from its first token's
+    start to its last token's end, with the highest token confidence. Runs are
+    found with array operations over the whole batch at once.
+
+    Args:
+        texts: The texts, one per row
+        predictions: (batch, tokens) predicted labels
+        confidences: (batch, tokens) probability of the jargon label
+        offset_mapping: (batch, tokens, 2) character offsets of each token
+
+    Returns:
+        List of span lists, one per text
+    """
+    valid = (offset_mapping[..., 0] != 0) | (offset_mapping[..., 1] != 0)
+    rows, positions = valid.nonzero(as_tuple=True)
+    results = [[] for _ in texts]
+    if rows.numel() == 0:
+        return results
+
+    # Flatten the real tokens of every row, in order
+    is_jargon = predictions[rows, positions] == 1
+    starts = offset_mapping[rows, positions, 0]
+    ends = offset_mapping[rows, positions, 1]
+    token_confidences = confidences[rows, positions]
+
+    # A run begins at a jargon token whose previous real token (in the same
+    # row) is not jargon, and ends where the next one is not
+    previous_jargon = torch.zeros_like(is_jargon)
+    previous_jargon[1:] = is_jargon[:-1] & (rows[1:] == rows[:-1])
+    next_jargon = torch.zeros_like(is_jargon)
+    next_jargon[:-1] = is_jargon[1:] & (rows[1:] == rows[:-1])
+    run_starts = is_jargon & ~previous_jargon
+    run_ends = is_jargon & ~next_jargon
+
+    run_count = int(run_starts.sum())
+    if run_count == 0:
+        return results
+
+    # Segment max of confidences over each run
+    run_ids = torch.cumsum(run_starts.long(), dim=0) - 1
+    run_confidences = torch.full((run_count,), float('-inf'), dtype=token_confidences.dtype)
+    run_confidences = run_confidences.scatter_reduce(
+        0, run_ids[is_jargon], token_confidences[is_jargon], reduce='amax'
+    )
+
+    for row, start, end, confidence in zip(
+        rows[run_starts].tolist(),
+        starts[run_starts].tolist(),
+        ends[run_ends].tolist(),
+        run_confidences.tolist()
+    ):
+        results[row].append(_make_span(texts[row], start, end, confidence))
+
+    return results
+
+
+def extract_spans(text, predictions, confidences, offset_mapping):
+    """Turn per-token predictions for one text into jargon spans"""
+    return extract_spans_batch(
+        [text], predictions[None], confidences[None], offset_mapping[None]
+    )[0]
+
+
+def compute_jargon_score(text, spans):
+    """Score a message by how densely and confidently it uses jargon"""
+    if not spans:
+        return 0
+
+    avg_confidence = sum(s["confidence"] for s in spans) / len(spans)
+    word_count = len(text.split())
+    return min(1.0, (len(spans) / max(word_count, 1)) * avg_confidence * 2)
+
+
+def bucket_by_length(lengths, batch_size=32, max_batch_tokens=8192):
+    """
+    Group sequence indices into batches of similar token length.
+
+    Indices are sorted by length so each batch pads to a length close to that
+    of its members. A batch is closed once it holds `batch_size` sequences or
+    padding it to its longest member would exceed `max_batch_tokens`.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    current = []
+    longest = 0
+
+    for i in order:
+        longest_with_i = max(longest, lengths[i])
+        if current and (len(current) >= batch_size or
+                        longest_with_i * (len(current) + 1) > max_batch_tokens):
+            batches.append(current)
+            current = []
+            longest_with_i = lengths[i]
+        current.append(i)
+        longest = longest_with_i
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _pad_batch(token_ids, offsets, pad_token_id):
+    """Right-pad token ids, masks and offsets to the longest sequence"""
+    width = max(len(ids) for ids in token_ids)
+    count = len(token_ids)
+
+    input_ids = torch.full((count, width), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((count, width), dtype=torch.long)
+    offset_mapping = torch.zeros((count, width, 2), dtype=torch.long)
+
+    for row, (ids, row_offsets) in enumerate(zip(token_ids, offsets)):
+        input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[row, :len(ids)] = 1
+        offset_mapping[row, :len(ids)] = torch.tensor(row_offsets, dtype=torch.long)
+
+    return input_ids, attention_mask, offset_mapping
+
+
+def stitch_windows(windows):
+    """
+    Combine per-token predictions from overlapping windows of one text.
+
+    `windows` is a list of (predictions, confidences, offset_mapping) tuples
+    in window order. A token seen in several windows takes its prediction from
+    the window where it sits furthest from either edge, i.e. where the model
+    saw the most context around it; ties go to the earlier window.
+
+    Returns:
+        Tuple of (predictions, confidences, offset_mapping) tensors covering
+        each token once, in text order
+    """
+    predictions, confidences, offsets, contexts = [], [], [], []
+
+    for window_predictions, window_confidences, window_offsets in windows:
+        valid = (window_offsets[:, 0] != 0) | (window_offsets[:, 1] != 0)
+        positions = valid.nonzero(as_tuple=True)[0]
+        k = torch.arange(len(positions))
+        contexts.append(torch.minimum(k, len(positions) - 1 - k))
+        predictions.append(window_predictions[positions])
+        confidences.append(window_confidences[positions])
+        offsets.append(window_offsets[positions])
+
+    predictions = torch.cat(predictions)
+    confidences = torch.cat(confidences)
+    offsets = torch.cat(offsets)
+    contexts = torch.cat(contexts)
+
+    # Order by (start, end, most context first); tokens are already in window
+    # order, so stable sorts keep the earlier window first on ties
+    order = torch.sort(-contexts, stable=True).indices
+    order = order[torch.sort(offsets[order, 1], stable=True).indices]
+    order = order[torch.sort(offsets[order, 0], stable=True).indices]
+    offsets = offsets[order]
+
+    # Keep the first entry for each distinct token
+    first = torch.ones(len(order), dtype=torch.bool)
+    first[1:] = (offsets[1:] != offsets[:-1]).any(dim=1)
+    keep = order[first]
+
+    return predictions[keep], confidences[keep], offsets[first]
+
+
+def detect_jargon_batch_with_model(texts, tokenizer, model, device,
+                                   batch_size=32, max_batch_tokens=8192,
+                                   window=None, stride=128, stats=None):
+    """
+    Detect jargon in many texts using length-bucketed forward passes.
+
+    Texts are tokenized once without padding, grouped into buckets of similar
+    length and each bucket is padded only to its own longest member. Results
+    are returned in the order of `texts`.
+
+    With `window` set, texts longer than `window` tokens are split into
+    windows overlapping by `stride` tokens instead of being truncated. All
+    windows are scored in the same bucketed passes and stitched back together
+    with `stitch_windows`, so long texts are covered in full at a cost linear
+    in their length.
+
+    If a `stats` dict is passed, seconds spent tokenizing, in forward passes
+    and extracting spans are added to its 'tokenize', 'forward' and
+    'extract' entries, and the size of every forward pass and the token
+    length of every window are appended to its 'batch_sizes' and
+    'window_tokens' lists.
+    """
+    if not texts:
+        return []
+
+    started = time.perf_counter()
+    chunked = bool(window)
+    encoding = tokenizer(
+        list(texts),
+        return_offsets_mapping=True,
+        truncation=True,
+        max_length=window if chunked else MAX_LENGTH,
+        stride=stride if chunked else 0,
+        return_overflowing_tokens=chunked
+    )
+    if chunked:
+        window_owner = encoding['overflow_to_sample_mapping']
+    else:
+        window_owner = list(range(len(texts)))
+
+    lengths = [len(ids) for ids in encoding['input_ids']]
+    timings = {'tokenize': time.perf_counter() - started, 'forward': 0.0, 'extract': 0.0}
+    batch_sizes = []
+    window_counts = [0] * len(texts)
+    for owner in window_owner:
+        window_counts[owner] += 1
+
+    results = [None] * len(texts)
+    window_outputs = [None] * len(lengths)
+
+    for bucket in bucket_by_length(lengths, batch_size, max_batch_tokens):
+        input_ids, attention_mask, offset_mapping = _pad_batch(
+            [encoding['input_ids'][i] for i in bucket],
+            [encoding['offset_mapping'][i] for i in bucket],
+            tokenizer.pad_token_id
+        )
+
+        started = time.perf_counter()
+        with torch.no_grad():
+            outputs = model(
+                input_ids=input_ids.to(device),
+                attention_mask=attention_mask.to(device)
+            )
+            predictions = torch.argmax(outputs.logits, dim=-1).cpu()
+            confidences = torch.softmax(outputs.logits, dim=-1)[..., 1].cpu()
+        timings['forward'] += time.perf_counter() - started
+        batch_sizes.append(len(bucket))
+        started = time.perf_counter()
+
+        # Texts that fit in one window are extracted for the whole bucket at once
+        single = [row for row, i in enumerate(bucket) if window_counts[window_owner[i]] == 1]
+        if single:
+            rows = torch.tensor(single, dtype=torch.long)
+            owners = [window_owner[bucket[row]] for row in single]
+            spans = extract_spans_batch(
+                [texts[owner] for owner in owners],
+                predictions[rows], confidences[rows], offset_mapping[rows]
+            )
+            for owner, text_spans in zip(owners, spans):
+                results[owner] = text_spans
+
+        for row, i in enumerate(bucket):
+            if window_counts[window_owner[i]] > 1:
+                window_outputs[i] = (predictions[row], confidences[row], offset_mapping[row])
+        timings['extract'] += time.perf_counter() - started
+
+    started = time.perf_counter()
+    windows_by_text = {}
+    for i, owner in enumerate(window_owner):
+        if window_outputs[i] is not None:
+            windows_by_text.setdefault(owner, []).append(window_outputs[i])
+
+    for owner, windows in windows_by_text.items():
+        results[owner] = extract_spans(texts[owner], *stitch_windows(windows))
+    timings['extract'] += time.perf_counter() - started
+
+    if stats is not None:
+        for stage, seconds in timings.items():
+            stats[stage] = stats.get(stage, 0.0) + seconds
+        stats.setdefault('batch_sizes', []).extend(batch_sizes)
+        stats.setdefault('window_tokens', []).extend(lengths)
+
+    return results
+
+
+def detect_jargon_with_model(text, tokenizer, model, device, window=None, stride=128):
+    """Detect jargon using the fine-tuned model"""
+    return detect_jargon_batch_with_model(
+        [text], tokenizer, model, device, window=window, stride=stride
+    )[0]
@@ -0,0 +1,205 @@
+import hashlib
+import heapq
+import json
+import threading
+from collections import OrderedDict, deque
+
+
+class TermMatcher:
+    """
+    Case-insensitive multi-term matcher built on an Aho-Corasick automaton.
+
+    The automaton is compiled once from `terms` and scans a text in a single
+    pass. Matches are resolved leftmost-first, preferring the longest term at a
+    given start, so the result is a sorted list of non-overlapping matches.
+
+    Args:
+        terms: Terms to look for
+        word_boundaries: Only accept matches not surrounded by letters or digits
+    """
+
+    def __init__(self, terms, word_boundaries=True):
+        self.terms = list(terms)
+        self.word_boundaries = word_boundaries
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+
+        for index, term in enumerate(self.terms):
+            if term:
+                self._add(term.lower(), index)
+        self._link()
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _add(self, term, index):
+        state = 0
+        for ch in term:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._goto[state][ch] = next_state
+            state = next_state
+        self._outputs[state].append((len(term), index))
+
+    def _link(self):
+        """Compute failure links breadth-first and merge their outputs"""
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, next_state in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(ch, 0)
+                self._outputs[next_state] = (
+                    self._outputs[next_state] + self._outputs[self._fail[next_state]]
+                )
+                pending.append(next_state)
+
+    def _at_boundary(self, text, start, end):
+        return ((start == 0 or not text[start - 1].isalnum()) and
+                (end >= len(text) or not text[end].isalnum()))
+
+    def find(self, text):
+        """Return sorted, non-overlapping (start, end, term_index) matches"""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        best = {}
+        state = 0
+
+        for i, ch in enumerate(text.lower()):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            for length, index in outputs[state]:
+                start = i + 1 - length
+                end = start + len(self.terms[index])
+                if self.word_boundaries and not self._at_boundary(text, start, end):
+                    continue
+                previous = best.get(start)
+                if (previous is None or length > previous[0] or
+                        (length == previous[0] and index < previous[1])):
+                    best[start] = (length, index)
+
+        matches = []
+        covered_until = 0
+        for start in sorted(best):
+            if start < covered_until:
+                continue
+            length, index = best[start]
+            end = start + len(self.terms[index])
+            matches.append((start, end, index))
+            covered_until = end
+
+        return matches
+
+
+def glossary_fingerprint(glossary):
+    """Content hash identifying a glossary's terms and plain-language text"""
+    payload = json.dumps(
+        [[entry.get('term', ''), entry.get('plainLanguage', '')] for entry in glossary],
+        separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class GlossaryMatcher:
+    """Finds every occurrence of an organization's glossary terms"""
+
+    def __init__(self, glossary):
+        self.entries = [entry for entry in glossary if entry.get('term', '')]
+        self._matcher = TermMatcher(
+            [entry['term'] for entry in self.entries],
+            word_boundaries=False
+        )
+
+    def find_spans(self, text):
+        spans = []
+        for start, end, index in self._matcher.find(text):
+            plain = self.entries[index].get('plainLanguage', '')
+            spans.append({
+                'start': start,
+                'end': end,
+                'confidence': 0.95,
+                'term': text[start:end],
+                'suggestion': plain if plain else 'Provide a simpler explanation',
+                'from_glossary': True
+            })
+        return spans
+
+    def substitutions(self, text):
+        """
+        (start, end, entry) for each glossary term in `text` that stands as a
+        whole word, the matches a rewrite can replace without splitting words
+        """
+        return [
+            (start, end, self.entries[index])
+            for start, end, index in self._matcher.find(text)
+            if self._matcher._at_boundary(text, start, end)
+        ]
+
+
+class GlossaryMatcherCache:
+    """
+    LRU cache of compiled glossary matchers keyed by glossary content hash.
+
+    Args:
+        max_entries: Number of distinct glossaries kept compiled at once
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max(1, int(max_entries))
+        self._matchers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._matchers)
+
+    def get(self, glossary, key=None):
+        """Return the compiled matcher for `glossary`, building it on a miss"""
+        if key is None:
+            key = glossary_fingerprint(glossary)
+
+        with self._lock:
+            matcher = self._matchers.get(key)
+            if matcher is not None:
+                self._matchers.move_to_end(key)
+                return matcher
+
+        # Compile outside the lock; a concurrent duplicate build is harmless
+        matcher = GlossaryMatcher(glossary)
+
+        with self._lock:
+            self._matchers[key] = matcher
+            self._matchers.move_to_end(key)
+            while len(self._matchers) > self.max_entries:
+                self._matchers.popitem(last=False)
+        return matcher
+
+
+def merge_spans(primary, secondary):
+    """
+    Merge two span lists into one sorted, non-overlapping list.
+
+    Every span in `primary` is kept; spans in `secondary` are added only where
+    they don't overlap a primary span. Both lists are walked once in start
+    order.
+    """
+    primary = sorted(primary, key=lambda s: s['start'])
+    secondary = sorted(secondary, key=lambda s: s['start'])
+
+    accepted = []
+    j = 0
+    for span in secondary:
+        while j < len(primary) and primary[j]['end'] <= span['start']:
+            j += 1
+        if j < len(primary) and primary[j]['start'] < span['end']:
+            continue
+        accepted.append(span)
+
+    return list(heapq.merge(primary, accepted, key=lambda s: s['start']))
@@ -0,0 +1,273 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import torch
+from transformers import RobertaTokenizerFast
+
+from backends import BACKENDS, artifact_version, load_backend
+from inference import compute_jargon_score, detect_jargon_batch_with_model
+from matcher import GlossaryMatcherCache, merge_spans
+
+# State of each worker process, set up once by init_worker
+_worker: dict[str, Any] = {}
+
+
+def load_glossaries(path):
+    """
+    Organization glossaries by id, from a JSON object of id to glossary or a
+    JSONL export of organizations with `_id` and `glossary`.
+    """
+    if not path:
+        return {}
+    with open(path, encoding='utf-8') as f:
+        if not path.endswith('.jsonl'):
+            return {str(key): value for key, value in json.load(f).items()}
+        glossaries = {}
+        for line in f:
+            if line.strip():
+                organization = json.loads(line)
+                glossaries[id_key(organization.get('_id'))] = organization.get('glossary') or []
+        return glossaries
+
+
+def id_key(value):
+    """Plain string form of an id, including mongoexport's {"$oid": ...}"""
+    if isinstance(value, dict) and '$oid' in value:
+        return value['$oid']
+    return str(value)
+
+
+def parse_message(line):
+    """
+    (id, text, glossary id) from an exported message line, or None if the
+    line has no id or text. Lines carry `_id`, `textOriginal` and the
+    organization id as `glossary_id`, which messages don't store and the
+    export has to join in; `id` and `text` are accepted too.
+    """
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+
+    message_id = record.get('_id', record.get('id'))
+    text = record.get('textOriginal', record.get('text'))
+    if message_id is None or not isinstance(text, str):
+        return None
+
+    glossary_id = record.get('glossary_id')
+    return message_id, text, id_key(glossary_id) if glossary_id is not None else None
+
+
+def init_worker(backend, model_path, tokenizer_path, threads, glossaries, options):
+    torch.set_num_threads(threads)
+    model, device = load_backend(backend, model_path, torch.device('cpu'))
+    _worker.update(
+        tokenizer=RobertaTokenizerFast.from_pretrained(tokenizer_path),
+        model=model,
+        device=device,
+        glossaries=glossaries,
+        matchers=GlossaryMatcherCache(),
+        options=options
+    )
+
+
+def score_chunk(messages):
+    """Score (id, text, glossary id) messages; returns output JSONL lines"""
+    texts = [text for _, text, _ in messages]
+    options = _worker['options']
+    spans = detect_jargon_batch_with_model(
+        texts, _worker['tokenizer'], _worker['model'], _worker['device'],
+        batch_size=options['batch_size'], max_batch_tokens=options['max_batch_tokens'],
+        window=options['window'], stride=options['stride']
+    )
+
+    lines = []
+    for (message_id, text, glossary_id), text_spans in zip(messages, spans):
+        glossary = _worker['glossaries'].get(glossary_id) if glossary_id is not None else None
+        if glossary:
+            text_spans = merge_spans(text_spans, _worker['matchers'].get(glossary).find_spans(text))
+        lines.append(json.dumps({
+            '_id': message_id,
+            'jargonScore': compute_jargon_score(text, text_spans),
+            'jargonSpans': [
+                {'start': s['start'], 'end': s['end'], 'confidence': s['confidence']}
+                for s in text_spans
+            ]
+        }) + '\n')
+    return lines
+
+
+def read_chunks(path, chunk_size, skip_lines):
+    """
+    Yield (lines read so far, messages, invalid lines) per chunk of input,
+    after skipping the first `skip_lines` lines.
+    """
+    line_number = 0
+    messages = []
+    invalid = 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line_number += 1
+            if line_number <= skip_lines or not line.strip():
+                continue
+            message = parse_message(line)
+            if message is None:
+                invalid += 1
+            else:
+                messages.append(message)
+            if len(messages) == chunk_size:
+                yield line_number, messages, invalid
+                messages, invalid = [], 0
+    if messages or invalid:
+        yield line_number, messages, invalid
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(state, f)
+    os.replace(temporary, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Re-score exported messages with the jargon model for a bulk update'
+    )
+    parser.add_argument('input', help='JSONL message export (_id, textOriginal, glossary_id)')
+    parser.add_argument('output', help='JSONL of _id, jargonScore and jargonSpans to import')
+    parser.add_argument('--glossaries', default=None,
+                        help='Organization glossaries: JSON of id to glossary, or a JSONL '
+                             'export of organizations')
+    parser.add_argument('--model-path', default='./jargon_model')
+    parser.add_argument('--tokenizer-path', default=None,
+                        help='Tokenizer directory (default: the model directory)')
+    parser.add_argument('--backend', choices=BACKENDS, default='torch')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads-per-worker', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=256,
+                        help='Messages per task handed to a worker')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-batch-tokens', type=int, default=8192)
+    parser.add_argument('--window', type=int, default=512,
+                        help='Tokens per window for long messages; 0 truncates at 512')
+    parser.add_argument('--stride', type=int, default=128)
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue from the checkpoint of an interrupted run')
+    parser.add_argument('--report-every', type=float, default=10.0,
+                        help='Seconds between progress lines')
+    args = parser.parse_args()
+
+    tokenizer_path = args.tokenizer_path or (
+        args.model_path if os.path.isdir(args.model_path) else './jargon_model'
+    )
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+    checkpoint_path = args.output + '.checkpoint'
+    model_version = f"{artifact_version(args.model_path)}:{args.backend}"
+
+    # Resume where the last completed chunk was written; anything written
+    # after it is cut off and scored again
+    checkpoint = load_checkpoint(checkpoint_path) if args.resume else None
+    if checkpoint and checkpoint['model_version'] != model_version:
+        sys.exit(f"Checkpoint is for model {checkpoint['model_version']}, not {model_version}")
+    state = checkpoint or {
+        'model_version': model_version, 'input_lines': 0, 'output_bytes': 0,
+        'messages': 0, 'invalid': 0
+    }
+    output = open(args.output, 'r+b' if checkpoint else 'wb')
+    output.truncate(state['output_bytes'])
+    output.seek(state['output_bytes'])
+    if checkpoint:
+        print(f"Resuming after {state['messages']} messages ({state['input_lines']} input lines)")
+
+    options = {
+        'batch_size': args.batch_size, 'max_batch_tokens': args.max_batch_tokens,
+        'window': args.window or None, 'stride': args.stride
+    }
+    started = time.monotonic()
+    last_report = started
+    scored_this_run = 0
+    read_this_run = 0
+    without_glossary = 0
+    warned = False
+    glossaries = load_glossaries(args.glossaries)
+
+    with output, ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=init_worker,
+        initargs=(args.backend, args.model_path, tokenizer_path, threads,
+                  glossaries, options)
+    ) as pool:
+        # Keep a bounded number of chunks in flight and write them in input
+        # order, so the checkpoint is just a position in each file
+        pending = deque()
+        chunks = read_chunks(args.input, args.chunk_size, state['input_lines'])
+
+        def finish_oldest():
+            nonlocal scored_this_run, last_report
+            input_lines, count, invalid, future = pending.popleft()
+            for line in future.result() if future else []:
+                output.write(line.encode('utf-8'))
+            output.flush()
+            os.fsync(output.fileno())
+            state.update(
+                input_lines=input_lines, output_bytes=output.tell(),
+                messages=state['messages'] + count, invalid=state['invalid'] + invalid
+            )
+            save_checkpoint(checkpoint_path, state)
+
+            scored_this_run += count
+            now = time.monotonic()
+            if now - last_report >= args.report_every:
+                rate = scored_this_run / (now - started)
+                print(f"{state['messages']} messages scored ({rate:.1f} messages/s)", flush=True)
+                last_report = now
+
+        for input_lines, messages, invalid in chunks:
+            read_this_run += len(messages)
+            without_glossary += sum(1 for _, _, glossary_id in messages if glossary_id is None)
+            if glossaries and not warned and without_glossary * 2 > read_this_run:
+                print("Warning: most messages have no glossary_id, so no organization "
+                      "glossary is applied to them; join it into the export", flush=True)
+                warned = True
+            future = pool.submit(score_chunk, messages) if messages else None
+            pending.append((input_lines, len(messages), invalid, future))
+            if len(pending) >= args.workers * 2:
+                finish_oldest()
+        while pending:
+            finish_oldest()
+
+    elapsed = time.monotonic() - started
+    report = {
+        'model_version': model_version,
+        'messages': state['messages'],
+        'invalid_lines': state['invalid'],
+        'scored_this_run': scored_this_run,
+        'without_glossary_id': without_glossary,
+        'seconds': round(elapsed, 3),
+        'messages_per_second': scored_this_run / elapsed if elapsed else 0.0,
+        'workers': args.workers,
+        'threads_per_worker': threads
+    }
+    print(json.dumps(report, indent=2))
+    # An input with no messages never writes a checkpoint
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def make_cache_key(text, glossary_key, model_version):
+    """
+    Build a result cache key from a text and the versions it was scored with.
+
+    The text is hashed exactly as sent: spans are character offsets into it,
+    so any rewriting of the text would also change the correct answer.
+    """
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return (digest, glossary_key, model_version)
+
+
+def estimate_result_size(result):
+    """Rough memory footprint of a detection result in bytes"""
+    size = 256
+    for span in result.get('jargon_spans', []):
+        size += 192 + len(span.get('term', '')) + len(span.get('suggestion', ''))
+    return size
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of detection results.
+
+    Entries are evicted least recently used first once either `max_entries`
+    results or roughly `max_bytes` of result data are held.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max(0, int(max_entries))
+        self.max_bytes = max(0, int(max_bytes))
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result):
+        if not self.max_entries:
+            return
+        size = estimate_result_size(result)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,94 @@
+import re
+
+_ARTICLE = re.compile(r'\b(an?)(\s+)$', re.IGNORECASE)
+_SENTENCE_END = '.!?\n'
+
+
+def match_case(occurrence, term, replacement):
+    """
+    `replacement` with the casing the writer gave `term` in `occurrence`.
+
+    Casing that differs from the glossary's own (an all-caps or capitalised
+    occurrence of a lowercase term) carries over; otherwise the plain
+    language is kept as written, so its acronyms and names survive.
+    """
+    if not replacement or occurrence == term:
+        return replacement
+    if occurrence.isupper() and len(occurrence) > 1 and not term.isupper():
+        return replacement.upper()
+    if occurrence[:1].isupper() and not term[:1].isupper():
+        return capitalize(replacement)
+    return replacement
+
+
+def capitalize(text):
+    return text[:1].upper() + text[1:]
+
+
+def starts_sentence(text, start):
+    before = text[:start].rstrip(' \t"\'(')
+    return not before or before[-1] in _SENTENCE_END
+
+
+def fix_article(before, replacement):
+    """Turn a trailing 'a'/'an' in `before` to agree with `replacement`"""
+    match = _ARTICLE.search(before)
+    first = replacement[:1].lower()
+    if match is None or first == 'u' or not first.isalpha():
+        # 'u' reads either way ("a user", "an update"), so it is left alone
+        return before
+    article = 'an' if first in 'aeio' else 'a'
+    if match.group(1).lower() == article:
+        return before
+    if match.group(1)[0].isupper():
+        article = capitalize(article)
+    return before[:match.start(1)] + article + match.group(2)
+
+
+def rewrite_with_glossary(text, glossary_matcher, jargon_spans):
+    """
+    Replace glossary terms with their plain language in a single pass.
+
+    Substitutions come from the compiled glossary matcher, so they are
+    sorted and never overlap. Detected spans (from /detect-jargon) that no
+    substitution covers, and glossary terms without plain language, are
+    left for a full rewrite.
+
+    Returns:
+        Tuple of (rewritten text, substitutions made, unresolved terms)
+    """
+    substitutions = []
+    unresolved = []
+    parts = []
+    position = 0
+
+    matches = glossary_matcher.substitutions(text) if glossary_matcher is not None else []
+    for start, end, entry in matches:
+        plain = (entry.get('plainLanguage') or '').strip()
+        occurrence = text[start:end]
+        if not plain:
+            unresolved.append(occurrence)
+            continue
+
+        replacement = match_case(occurrence, entry['term'], plain)
+        if starts_sentence(text, start):
+            replacement = capitalize(replacement)
+        parts.append(fix_article(text[position:start], replacement))
+        parts.append(replacement)
+        position = end
+        substitutions.append({
+            'start': start,
+            'end': end,
+            'term': occurrence,
+            'replacement': replacement
+        })
+    parts.append(text[position:])
+
+    replaced = [(s['start'], s['end']) for s in substitutions]
+    for span in jargon_spans:
+        if span.get('from_glossary'):
+            continue
+        if not any(start <= span['start'] and span['end'] <= end for start, end in replaced):
+            unresolved.append(span.get('term', text[span['start']:span['end']]))
+
+    return ''.join(parts), substitutions, unresolved
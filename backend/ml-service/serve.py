@@ -0,0 +1,106 @@
+import argparse
+import gc
+import os
+import tempfile
+
+import torch
+from gunicorn.app.base import BaseApplication
+
+
+def threads_per_worker(workers):
+    """Split the machine's cores between workers so they don't oversubscribe"""
+    configured = os.environ.get('JARGON_TORCH_THREADS')
+    if configured:
+        return max(1, int(configured))
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+class JargonServer(BaseApplication):
+    """
+    Pre-forking gunicorn server for the ML service.
+
+    The Flask app, and with it the model, is imported once in the parent.
+    Workers are forked afterwards and share the weights copy-on-write: the
+    weights are never written after loading, and safetensors model directories
+    are memory-mapped, so N workers cost roughly one copy of the model.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Load synchronously: a background loader thread wouldn't survive fork
+        os.environ['JARGON_LAZY_LOAD'] = '0'
+        # The model watch starts in each worker (post_fork), never in the
+        # master, which doesn't serve requests
+        os.environ['JARGON_PREFORK'] = '1'
+
+        # Workers share uploaded glossaries through a directory, since a
+        # glossary upload only reaches one of them
+        if not os.environ.get('JARGON_GLOSSARY_DIR'):
+            os.environ['JARGON_GLOSSARY_DIR'] = tempfile.mkdtemp(prefix='jargon-glossaries-')
+
+        import app
+
+        # Move everything allocated so far out of the garbage collector's
+        # reach so collections in workers don't touch the shared pages
+        gc.collect()
+        gc.freeze()
+        return app.app
+
+
+def post_fork(server, worker):
+    import app
+
+    threads = threads_per_worker(server.cfg.workers)
+    torch.set_num_threads(threads)
+
+    # ONNX Runtime sessions own thread pools that don't survive fork, so each
+    # worker opens its own session on the shared graph file
+    current = app.active_model
+    onnx_path = getattr(current.model, 'onnx_path', None) if current else None
+    if onnx_path:
+        from backends import OnnxTokenClassifier
+        app.activate_model(app.LoadedModel(
+            current.tokenizer, OnnxTokenClassifier(onnx_path, intra_op_threads=threads),
+            current.device, current.version, current.model_path,
+            current.tokenizer_path, current.backend
+        ))
+
+    # Model watch threads don't survive fork either; each worker polls and
+    # reloads on its own
+    app.start_model_watch()
+
+    server.log.info(f"Worker {worker.pid} using {threads} intra-op threads")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the ML service with forked workers')
+    parser.add_argument('--bind', default=os.environ.get('JARGON_BIND', '0.0.0.0:5001'))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('JARGON_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--threads', type=int,
+                        default=int(os.environ.get('JARGON_WORKER_THREADS', '8')),
+                        help='Request threads per worker, feeding its micro-batcher')
+    parser.add_argument('--timeout', type=int, default=60)
+    args = parser.parse_args()
+
+    server = JargonServer({
+        'bind': args.bind,
+        'workers': args.workers,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'timeout': args.timeout,
+        'preload_app': True,
+        'post_fork': post_fork
+    })
+    server.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from itertools import chain
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+# Bump when the on-disk layout or the label alignment changes
+CACHE_FORMAT = 1
+
+ID_DTYPE = np.int32
+LABEL_DTYPE = np.int8
+
+
+def align_token_labels_batch(texts, char_labels, offset_mappings):
+    """
+    Label the tokens of many texts at once by majority vote over characters.
+
+    A token is labelled 1 when more than half of its characters are inside a
+    jargon span, 0 otherwise, and special tokens (offset (0, 0)) get -100 so
+    the loss ignores them. The texts are laid end to end so jargon characters
+    are counted with a single prefix sum, which each token reads at its start
+    and end offsets.
+
+    Returns:
+        Flat int64 array of the labels of every token of every text, in order
+    """
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    bases = np.concatenate(([0], np.cumsum(lengths)))
+    token_counts = np.fromiter((len(offsets) for offsets in offset_mappings),
+                               dtype=np.int64, count=len(offset_mappings))
+
+    # Mark span starts +1 and ends -1 so a running sum is the coverage
+    boundaries = np.zeros(bases[-1] + 1, dtype=np.int64)
+    span_starts, span_ends = [], []
+    for base, length, spans in zip(bases, lengths, char_labels):
+        for start, end, _ in spans:
+            start, end = min(max(start, 0), length), min(end, length)
+            if start < end:
+                span_starts.append(base + start)
+                span_ends.append(base + end)
+    np.add.at(boundaries, np.asarray(span_starts, dtype=np.int64), 1)
+    np.add.at(boundaries, np.asarray(span_ends, dtype=np.int64), -1)
+    is_jargon = np.cumsum(boundaries[:-1]) > 0
+    jargon_before = np.concatenate(([0], np.cumsum(is_jargon)))
+
+    if hasattr(offset_mappings, 'shape'):
+        # A padded (texts, tokens, 2) tensor or array
+        offsets = np.asarray(offset_mappings, dtype=np.int64).reshape(-1, 2)
+    else:
+        offsets = np.fromiter(
+            chain.from_iterable(chain.from_iterable(offset_mappings)), dtype=np.int64
+        ).reshape(-1, 2)
+    special = (offsets[:, 0] == 0) & (offsets[:, 1] == 0)
+
+    # Offsets past the end of the text count only the characters that exist
+    token_lengths = np.repeat(lengths, token_counts)
+    token_bases = np.repeat(bases[:-1], token_counts)
+    starts = np.minimum(offsets[:, 0], token_lengths)
+    ends = np.maximum(np.minimum(offsets[:, 1], token_lengths), starts)
+
+    jargon_chars = jargon_before[token_bases + ends] - jargon_before[token_bases + starts]
+    labels = (2 * jargon_chars > ends - starts).astype(np.int64)
+    labels[special] = -100
+    return labels
+
+
+def cache_key(texts_and_labels, tokenizer, max_length):
+    """
+    Fingerprint of everything the cached arrays depend on: the tokenizer's
+    full definition, the truncation length and every example with its labels.
+    """
+    # Truncation and padding settings change as the tokenizer is called
+    definition = json.loads(tokenizer.backend_tokenizer.to_str())
+    definition.pop('truncation', None)
+    definition.pop('padding', None)
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        'format': CACHE_FORMAT,
+        'max_length': max_length,
+        'tokenizer': definition,
+        'special_tokens': tokenizer.special_tokens_map
+    }, sort_keys=True).encode('utf-8'))
+    for text, labels in texts_and_labels:
+        digest.update(json.dumps([text, [list(label) for label in labels]]).encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def write_token_cache(texts_and_labels, tokenizer, path, max_length=128, chunk_size=1000):
+    """
+    Tokenize and align labels once, writing unpadded arrays to `path`.
+
+    Token ids and labels of all examples are concatenated into flat binary
+    files with an index of where each example starts, so the cache takes
+    the size of the real tokens rather than of padded tensors and is written
+    a chunk at a time.
+    """
+    os.makedirs(path, exist_ok=True)
+    examples = 0
+    tokens = 0
+
+    with open(os.path.join(path, 'input_ids.bin'), 'wb') as ids_file, \
+            open(os.path.join(path, 'labels.bin'), 'wb') as labels_file, \
+            open(os.path.join(path, 'offsets.bin'), 'wb') as offsets_file:
+        np.zeros(1, dtype=np.int64).tofile(offsets_file)
+
+        def flush(chunk):
+            nonlocal examples, tokens
+            encoding = tokenizer(
+                [text for text, _ in chunk],
+                max_length=max_length,
+                truncation=True,
+                return_offsets_mapping=True
+            )
+            ids = encoding['input_ids']
+            np.fromiter((i for example in ids for i in example), dtype=ID_DTYPE).tofile(ids_file)
+            align_token_labels_batch(
+                [text for text, _ in chunk],
+                [char_labels for _, char_labels in chunk],
+                encoding['offset_mapping']
+            ).astype(LABEL_DTYPE).tofile(labels_file)
+
+            ends = tokens + np.cumsum([len(example) for example in ids], dtype=np.int64)
+            ends.tofile(offsets_file)
+            tokens = int(ends[-1])
+            examples += len(chunk)
+
+        chunk = []
+        for example in texts_and_labels:
+            chunk.append(example)
+            if len(chunk) == chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({
+            'format': CACHE_FORMAT,
+            'examples': examples,
+            'tokens': tokens,
+            'max_length': max_length,
+            'pad_token_id': tokenizer.pad_token_id
+        }, f)
+
+
+def prepare_token_cache(texts_and_labels, tokenizer, cache_dir, max_length=128):
+    """
+    Return the cache directory for these examples, building it on first use.
+
+    Caches live under `cache_dir` in a directory named by `cache_key`, so a
+    changed tokenizer, length or corpus gets a fresh cache. A cache is
+    written to a temporary directory and renamed into place, so an
+    interrupted run never leaves a half-written one behind.
+    """
+    texts_and_labels = list(texts_and_labels)
+    path = os.path.join(cache_dir, cache_key(texts_and_labels, tokenizer, max_length))
+    if os.path.isfile(os.path.join(path, 'meta.json')):
+        return path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=cache_dir, prefix='.building-')
+    try:
+        write_token_cache(texts_and_labels, tokenizer, staging, max_length)
+        os.rename(staging, path)
+    except OSError:
+        # Another process finished the same cache first
+        if not os.path.isfile(os.path.join(path, 'meta.json')):
+            raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return path
+
+
+class CachedJargonDataset(Dataset):
+    """
+    Training examples read lazily from a token cache.
+
+    The arrays are memory-mapped when first accessed, so each DataLoader
+    worker maps the files itself and only the pages of examples actually
+    read are loaded. Examples are returned unpadded unless `pad_to` is set.
+    """
+
+    def __init__(self, path, pad_to=None):
+        self.path = path
+        self.pad_to = pad_to
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self._arrays = None
+
+    def _open(self):
+        if self._arrays is None:
+            def mmap(name, dtype, count):
+                return np.memmap(os.path.join(self.path, name), dtype=dtype,
+                                 mode='r', shape=(count,))
+            self._arrays = (
+                mmap('input_ids.bin', ID_DTYPE, self.meta['tokens']),
+                mmap('labels.bin', LABEL_DTYPE, self.meta['tokens']),
+                mmap('offsets.bin', np.int64, self.meta['examples'] + 1)
+            )
+        return self._arrays
+
+    @property
+    def lengths(self):
+        """Token count of every example, without padding"""
+        return np.diff(self._open()[2])
+
+    def __len__(self):
+        return self.meta['examples']
+
+    def __getitem__(self, idx):
+        input_ids, labels, offsets = self._open()
+        start, end = offsets[idx], offsets[idx + 1]
+        ids = torch.from_numpy(input_ids[start:end].astype(np.int64))
+        item = {
+            'input_ids': ids,
+            'attention_mask': torch.ones_like(ids),
+            'labels': torch.from_numpy(labels[start:end].astype(np.int64))
+        }
+
+        if self.pad_to is not None and len(ids) < self.pad_to:
+            padding = self.pad_to - len(ids)
+            item['input_ids'] = torch.nn.functional.pad(
+                item['input_ids'], (0, padding), value=self.meta['pad_token_id'])
+            item['attention_mask'] = torch.nn.functional.pad(item['attention_mask'], (0, padding))
+            item['labels'] = torch.nn.functional.pad(item['labels'], (0, padding), value=-100)
+        return item
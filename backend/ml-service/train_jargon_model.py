@@ -1,5 +1,9 @@
+import argparse
+import random
+
 import torch
-from torch.utils.data import Dataset, DataLoader
+from torch.nn.utils.rnn import pad_sequence
+from torch.utils.data import Dataset, DataLoader, Sampler
 from transformers import (
     RobertaTokenizerFast, 
     RobertaForTokenClassification,
@@ -9,6 +13,14 @@ from torch.optim import AdamW
 from sklearn.model_selection import train_test_split  
 from tqdm import tqdm
 
+from corpus import StreamingJargonDataset
+from inference import extract_spans
+from token_cache import CachedJargonDataset, align_token_labels_batch, prepare_token_cache
+
+# Tokenized training data is cached here between runs
+TOKEN_CACHE_DIR = './token_cache'
+MAX_LENGTH = 128
+
 def create_training_data():
     training_examples = [
         (
@@ -51,14 +63,11 @@ def create_training_data():
     return training_examples
 
 
-def tokenize_and_align_labels(text, char_labels, tokenizer, max_length=128):
-    char_to_label = [0] * len(text) 
-    for start, end, label in char_labels:
-        for i in range(start, min(end, len(text))):
-            char_to_label[i] = 1 # 1 is jargon
-    
+def tokenize_and_align_labels_batch(texts_and_labels, tokenizer, max_length=128):
+    """Tokenize examples in one call, padded to `max_length`, with token labels"""
+    texts = [text for text, _ in texts_and_labels]
     encoding = tokenizer(
-        text,
+        texts,
         max_length=max_length,
         padding='max_length',
         truncation=True,
@@ -66,33 +75,33 @@ def tokenize_and_align_labels(text, char_labels, tokenizer, max_length=128):
         return_tensors='pt'
     )
     
-    offset_mapping = encoding['offset_mapping'][0]
-    labels = []
-    
-    for i, (start, end) in enumerate(offset_mapping):
-        if start == 0 and end == 0:
-            labels.append(-100)
-        else:
-            # Check if majority of characters in token span are jargon
-            token_chars = char_to_label[start:end]
-            if token_chars and sum(token_chars) > len(token_chars) / 2:
-                labels.append(1)  
-            else:
-                labels.append(0)  
-    
-    return {
-        'input_ids': encoding['input_ids'][0],
-        'attention_mask': encoding['attention_mask'][0],
-        'labels': torch.tensor(labels)
-    }
+    labels = align_token_labels_batch(
+        texts,
+        [char_labels for _, char_labels in texts_and_labels],
+        encoding['offset_mapping']
+    ).reshape(len(texts), -1)
+    
+    return [
+        {
+            'input_ids': encoding['input_ids'][i],
+            'attention_mask': encoding['attention_mask'][i],
+            'labels': torch.from_numpy(labels[i])
+        }
+        for i in range(len(texts))
+    ]
+
+
+def tokenize_and_align_labels(text, char_labels, tokenizer, max_length=128):
+    return tokenize_and_align_labels_batch([(text, char_labels)], tokenizer, max_length)[0]
 
 
 class JargonDataset(Dataset):
+    """In-memory dataset of padded examples, for small corpora"""
+
     def __init__(self, texts_and_labels, tokenizer, max_length=128):
-        self.encodings = []
-        for text, labels in texts_and_labels:
-            encoding = tokenize_and_align_labels(text, labels, tokenizer, max_length)
-            self.encodings.append(encoding)
+        self.encodings = tokenize_and_align_labels_batch(
+            list(texts_and_labels), tokenizer, max_length
+        )
     
     def __len__(self):
         return len(self.encodings)
@@ -100,7 +109,74 @@ class JargonDataset(Dataset):
     def __getitem__(self, idx):
         return self.encodings[idx]
 
-def train_model(train_loader, val_loader, model, device, epochs=3, lr=5e-5):
+class DynamicPaddingCollator:
+    """Pad each batch only to the length of its longest example"""
+
+    def __init__(self, pad_token_id):
+        self.pad_token_id = pad_token_id
+
+    def __call__(self, batch):
+        return {
+            'input_ids': pad_sequence([item['input_ids'] for item in batch],
+                                      batch_first=True, padding_value=self.pad_token_id),
+            'attention_mask': pad_sequence([item['attention_mask'] for item in batch],
+                                           batch_first=True, padding_value=0),
+            'labels': pad_sequence([item['labels'] for item in batch],
+                                   batch_first=True, padding_value=-100)
+        }
+
+
+class LengthGroupedSampler(Sampler):
+    """
+    Batch sampler that puts examples of similar length in the same batch.
+
+    With `shuffle`, examples are shuffled, split into groups of
+    `group_batches` batches, sorted by length within each group and the
+    resulting batches shuffled again, so batches stay random across epochs
+    while padding stays small. Without it, batches are cut from the examples
+    sorted by length, for validation. Use as a DataLoader's `batch_sampler`
+    and call `set_epoch` before each epoch for a new order.
+    """
+
+    def __init__(self, lengths, batch_size, shuffle=True, group_batches=50, seed=0):
+        self.lengths = [int(length) for length in lengths]
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.group_size = batch_size * group_batches
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        indices = list(range(len(self.lengths)))
+        if not self.shuffle:
+            indices.sort(key=self.lengths.__getitem__)
+            groups = [indices]
+        else:
+            rng = random.Random(self.seed + self.epoch)
+            rng.shuffle(indices)
+            groups = [
+                sorted(indices[i:i + self.group_size], key=self.lengths.__getitem__)
+                for i in range(0, len(indices), self.group_size)
+            ]
+
+        batches = [
+            group[i:i + self.batch_size]
+            for group in groups
+            for i in range(0, len(group), self.batch_size)
+        ]
+        if self.shuffle:
+            rng.shuffle(batches)
+        return iter(batches)
+
+
+def train_model(train_loader, val_loader, model, device, epochs=3, lr=5e-5,
+                output_dir='./jargon_model'):
     """
     Train the RoBERTa model for jargon detection.
     
@@ -111,6 +187,8 @@ def train_model(train_loader, val_loader, model, device, epochs=3, lr=5e-5):
         device: cuda or cpu
         epochs: Number of training epochs
         lr: Learning rate
+        output_dir: Directory the best model is saved to (config and
+            safetensors weights, loadable without roberta-base)
     """
     optimizer = AdamW(model.parameters(), lr=lr)
     
@@ -124,9 +202,14 @@ def train_model(train_loader, val_loader, model, device, epochs=3, lr=5e-5):
     best_val_loss = float('inf')
     
     for epoch in range(epochs):
+        for target in (train_loader.batch_sampler, train_loader.dataset):
+            if hasattr(target, 'set_epoch'):
+                target.set_epoch(epoch)
+        
         # Training
         model.train()
         train_loss = 0
+        train_batches = 0
         train_bar = tqdm(train_loader, desc=f'Epoch {epoch+1}/{epochs} [Train]')
         
         for batch in train_bar:
@@ -151,13 +234,16 @@ def train_model(train_loader, val_loader, model, device, epochs=3, lr=5e-5):
             scheduler.step()
             
             train_loss += loss.item()
+            train_batches += 1
             train_bar.set_postfix({'loss': loss.item()})
         
-        avg_train_loss = train_loss / len(train_loader)
+        # Streamed datasets can yield a few more batches than len() estimates
+        avg_train_loss = train_loss / max(train_batches, 1)
         
         # Validation
         model.eval()
         val_loss = 0
+        val_batches = 0
         
         with torch.no_grad():
             for batch in tqdm(val_loader, desc=f'Epoch {epoch+1}/{epochs} [Val]'):
@@ -172,8 +258,9 @@ def train_model(train_loader, val_loader, model, device, epochs=3, lr=5e-5):
                 )
                 
                 val_loss += outputs.loss.item()
+                val_batches += 1
         
-        avg_val_loss = val_loss / len(val_loader)
+        avg_val_loss = val_loss / max(val_batches, 1)
         
         print(f'\nEpoch {epoch+1}:')
         print(f'  Train Loss: {avg_train_loss:.4f}')
@@ -182,10 +269,72 @@ def train_model(train_loader, val_loader, model, device, epochs=3, lr=5e-5):
         # Save best model
         if avg_val_loss < best_val_loss:
             best_val_loss = avg_val_loss
-            torch.save(model.state_dict(), 'best_jargon_model.pt')
-            print('Saved best model!')
+            model.save_pretrained(output_dir, safe_serialization=True)
+            print(f'Saved best model to {output_dir}!')
+
+def in_memory_loaders(tokenizer, val_fraction):
+    """Train and validation loaders over the built-in examples"""
+    training_data = create_training_data()
+    
+    training_data = training_data * 10  # Simulate more data
+    
+    # split into training and validation data 
+    train_data, val_data = train_test_split(
+        training_data, 
+        test_size=val_fraction, 
+        random_state=42
+    )
+    
+    print(f"Train examples: {len(train_data)}")
+    print(f"Val examples: {len(val_data)}")
+    
+    # Create datasets from the token cache, tokenizing only on the first run
+    train_dataset = CachedJargonDataset(
+        prepare_token_cache(train_data, tokenizer, TOKEN_CACHE_DIR, MAX_LENGTH)
+    )
+    val_dataset = CachedJargonDataset(
+        prepare_token_cache(val_data, tokenizer, TOKEN_CACHE_DIR, MAX_LENGTH)
+    )
+    
+    # Create data loaders; batches of similar lengths are padded only to
+    # their longest example
+    collator = DynamicPaddingCollator(tokenizer.pad_token_id)
+    train_loader = DataLoader(
+        train_dataset,
+        batch_sampler=LengthGroupedSampler(train_dataset.lengths, batch_size=8),
+        collate_fn=collator
+    )
+    val_loader = DataLoader(
+        val_dataset,
+        batch_sampler=LengthGroupedSampler(val_dataset.lengths, batch_size=8, shuffle=False),
+        collate_fn=collator
+    )
+    return train_loader, val_loader
+
+def streaming_loaders(paths, tokenizer, val_fraction, workers, batch_size=8):
+    """Train and validation loaders streaming examples from JSONL files"""
+    collator = DynamicPaddingCollator(tokenizer.pad_token_id)
+    loaders = []
+    for split in ('train', 'val'):
+        dataset = StreamingJargonDataset(
+            paths, tokenizer, split=split, val_fraction=val_fraction,
+            max_length=MAX_LENGTH, shuffle_buffer=10000 if split == 'train' else 0
+        )
+        print(f"{split.capitalize()} examples: {len(dataset)}")
+        loaders.append(DataLoader(dataset, batch_size=batch_size, collate_fn=collator,
+                                  num_workers=workers))
+    return loaders
 
 def main():
+    parser = argparse.ArgumentParser(description='Fine-tune RoBERTa for jargon detection')
+    parser.add_argument('--corpus', nargs='+', default=None,
+                        help='JSONL files of {"text": ..., "spans": [[start, end, label], ...]} '
+                             '(optionally gzipped) to stream instead of the built-in examples')
+    parser.add_argument('--val-fraction', type=float, default=0.2)
+    parser.add_argument('--workers', type=int, default=2,
+                        help='DataLoader worker processes reading the corpus')
+    args = parser.parse_args()
+    
     print("Starting RoBERTa fine-tuning for jargon detection...")
     
     # Set device
@@ -205,48 +354,29 @@ def main():
     
     # Prepare data
     print("\nPreparing training data...")
-    training_data = create_training_data()
-    
-    training_data = training_data * 10  # Simulate more data
-    
-    # split into training and validation data 
-    train_data, val_data = train_test_split(
-        training_data, 
-        test_size=0.2, 
-        random_state=42
-    )
-    
-    print(f"Train examples: {len(train_data)}")
-    print(f"Val examples: {len(val_data)}")
-    
-    # Create datasets
-    train_dataset = JargonDataset(train_data, tokenizer)
-    val_dataset = JargonDataset(val_data, tokenizer)
-    
-    # Create data loaders
-    train_loader = DataLoader(train_dataset, batch_size=8, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=8, shuffle=False)
+    if args.corpus:
+        train_loader, val_loader = streaming_loaders(
+            args.corpus, tokenizer, args.val_fraction, args.workers
+        )
+    else:
+        train_loader, val_loader = in_memory_loaders(tokenizer, args.val_fraction)
     
     # Train model
     print("\nStarting training...")
     train_model(train_loader, val_loader, model, device, epochs=5, lr=5e-5)
     
-    print("\nTraining complete! Best model saved as 'best_jargon_model.pt'")
+    print("\nTraining complete! Best model saved to './jargon_model'")
     
-    # Save tokenizer
+    # Save tokenizer next to the model so the directory is self-contained
     tokenizer.save_pretrained('./jargon_model')
     print("Tokenizer saved to './jargon_model'")
 
-def load_trained_model(model_path='best_jargon_model.pt'):
+def load_trained_model(model_path='./jargon_model'):
     """Load the fine-tuned model for inference."""
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     
-    tokenizer = RobertaTokenizerFast.from_pretrained('./jargon_model')
-    model = RobertaForTokenClassification.from_pretrained(
-        'roberta-base',
-        num_labels=2
-    )
-    model.load_state_dict(torch.load(model_path, map_location=device))
+    tokenizer = RobertaTokenizerFast.from_pretrained(model_path)
+    model = RobertaForTokenClassification.from_pretrained(model_path)
     model.to(device)
     model.eval()
     
@@ -288,47 +418,7 @@ def detect_jargon(text, tokenizer, model, device, glossary=None):
         probs = torch.softmax(outputs.logits, dim=-1)[0]
     
     # Extract jargon spans
-    jargon_spans = []
-    current_span = None
-    
-    for i, (pred, prob, (start, end)) in enumerate(zip(predictions, probs, offset_mapping)):
-        if start == 0 and end == 0:  # Special token
-            continue
-        
-        if pred == 1:  # Jargon
-            confidence = prob[1].item()
-            
-            if current_span is None:
-                current_span = {
-                    'start': start.item(),
-                    'end': end.item(),
-                    'confidence': confidence
-                }
-            else:
-                # Extend span
-                current_span['end'] = end.item()
-                current_span['confidence'] = max(current_span['confidence'], confidence)
-        else:
-            if current_span is not None:
-                term = text[current_span['start']:current_span['end']]
-                jargon_spans.append({
-                    'start': current_span['start'],
-                    'end': current_span['end'],
-                    'confidence': current_span['confidence'],
-                    'term': term,
-                    'suggestion': f'Consider simplifying "{term}"'
-                })
-                current_span = None
-    
-    if current_span is not None:
-        term = text[current_span['start']:current_span['end']]
-        jargon_spans.append({
-            'start': current_span['start'],
-            'end': current_span['end'],
-            'confidence': current_span['confidence'],
-            'term': term,
-            'suggestion': f'Consider simplifying "{term}"'
-        })
+    jargon_spans = extract_spans(text, predictions, probs[:, 1], offset_mapping)
     
     # Add glossary terms
     if glossary:
@@ -1,7 +1,13 @@
 import express from "express";
 import { auth } from "../middleware/auth.js";
-import { runJargonDetectionProxy } from "../services/jargonDetector.js";
+import {
+  runJargonDetectionProxy,
+  runJargonDetectionBatchProxy,
+  runJargonDetectionIncrementalProxy,
+  runLocalRewriteProxy
+} from "../services/jargonDetector.js";
 import { runRewrite } from "../services/rewrite.js";
+import { withOrgGlossary } from "../services/glossaryRegistry.js";
 import Organization from "../models/Organization.js";
 import User from "../models/User.js";
 
@@ -10,14 +16,49 @@ const router = express.Router();
 router.post("/detect-jargon", auth, async (req, res) => {
   const { text } = req.body;
   const user = await User.findById(req.user.id);
-  const org = await Organization.findById(user.organizationId).select("glossary");
-  const result = await runJargonDetectionProxy({ text, glossary: org?.glossary || [] });
+  const result = await withOrgGlossary(user.organizationId, (glossaryRef) =>
+    runJargonDetectionProxy({ text, ...glossaryRef })
+  );
+  res.json(result);
+});
+
+router.post("/detect-jargon/incremental", auth, async (req, res) => {
+  const { text, sessionId } = req.body;
+  if (!sessionId) return res.status(400).json({ error: "sessionId is required" });
+  const user = await User.findById(req.user.id);
+  // Namespace drafts per user so sessions can't collide across accounts
+  const result = await withOrgGlossary(user.organizationId, (glossaryRef) =>
+    runJargonDetectionIncrementalProxy({ sessionId: `${req.user.id}:${sessionId}`, text, ...glossaryRef })
+  );
+  res.json(result);
+});
+
+router.post("/detect-jargon/batch", auth, async (req, res) => {
+  const { texts } = req.body;
+  const user = await User.findById(req.user.id);
+  const result = await withOrgGlossary(user.organizationId, (glossaryRef) =>
+    runJargonDetectionBatchProxy({ texts, ...glossaryRef })
+  );
   res.json(result);
 });
 
 router.post("/rewrite", auth, async (req, res) => {
   const { text, audience, tone } = req.body;
   const user = await User.findById(req.user.id);
+
+  // Glossary substitution in the ML service answers most rewrites; the LLM
+  // only runs when that leaves jargon unexplained or the tone must change
+  try {
+    const local = await withOrgGlossary(user.organizationId, (glossaryRef) =>
+      runLocalRewriteProxy({ text, audience, tone, ...glossaryRef })
+    );
+    if (!local.llmRecommended) {
+      return res.json({ rewrittenText: local.rewrittenText });
+    }
+  } catch (err) {
+    console.error("Local rewrite failed, using the LLM:", err.message);
+  }
+
   const org = await Organization.findById(user.organizationId).select("glossary");
   const rewrittenText = await runRewrite({
     text,
@@ -0,0 +1,63 @@
+import Organization from "../models/Organization.js";
+
+// Glossary versions this backend process has uploaded to the ML service
+const registeredVersions = new Map();
+
+async function registerGlossary(orgId) {
+  const org = await Organization.findById(orgId).select("glossary updatedAt");
+  const version = String(org.updatedAt.getTime());
+
+  const response = await fetch(`${process.env.ML_SERVICE_URL}/glossaries/${orgId}`, {
+    method: "PUT",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      version,
+      glossary: org.glossary.map(({ term, plainLanguage }) => ({ term, plainLanguage }))
+    })
+  });
+
+  if (!response.ok) {
+    throw new Error(`Glossary registration error: ${response.statusText}`);
+  }
+
+  registeredVersions.set(String(orgId), version);
+  return version;
+}
+
+async function getGlossaryRef(orgId) {
+  const org = await Organization.findById(orgId).select("updatedAt");
+  if (!org) return null;
+
+  let version = String(org.updatedAt.getTime());
+  if (registeredVersions.get(String(orgId)) !== version) {
+    version = await registerGlossary(orgId);
+  }
+
+  return { glossaryId: String(orgId), glossaryVersion: version };
+}
+
+// Call the ML service with a registered glossary reference instead of the
+// full glossary, re-registering once if the service has forgotten it and
+// sending the glossary inline if it still can't find it.
+export async function withOrgGlossary(orgId, call) {
+  const ref = orgId ? await getGlossaryRef(orgId) : null;
+  if (!ref) return call({ glossary: [] });
+
+  try {
+    return await call(ref);
+  } catch (err) {
+    if (err.status !== 404) throw err;
+    registeredVersions.delete(String(orgId));
+  }
+
+  try {
+    return await call(await getGlossaryRef(orgId));
+  } catch (err) {
+    if (err.status !== 404) throw err;
+    registeredVersions.delete(String(orgId));
+    const org = await Organization.findById(orgId).select("glossary");
+    return call({
+      glossary: org.glossary.map(({ term, plainLanguage }) => ({ term, plainLanguage }))
+    });
+  }
+}
@@ -1,13 +1,65 @@
-export async function runJargonDetectionProxy({ text, glossary = [] }) {
-  const response = await fetch(`${process.env.ML_SERVICE_URL}/detect-jargon`, {
+// Latency budget for detection while composing: past it the ML service
+// answers with fast rule-based highlights instead of waiting for the model.
+// 0 waits for the model.
+const COMPOSE_BUDGET_MS = Number(process.env.JARGON_COMPOSE_BUDGET_MS ?? 300);
+
+function composeBudget() {
+  return COMPOSE_BUDGET_MS > 0 ? COMPOSE_BUDGET_MS : undefined;
+}
+
+async function postToJargonService(path, body) {
+  const response = await fetch(`${process.env.ML_SERVICE_URL}${path}`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ text, glossary })
+    body: JSON.stringify(body)
   });
 
   if (!response.ok) {
-    throw new Error(`Jargon service error: ${response.statusText}`);
+    const error = new Error(`Jargon service error: ${response.statusText}`);
+    error.status = response.status;
+    throw error;
   }
 
   return response.json();
-}
\ No newline at end of file
+}
+
+export async function runJargonDetectionProxy({ text, glossary, glossaryId, glossaryVersion }) {
+  return postToJargonService("/detect-jargon", {
+    text,
+    glossary,
+    latency_budget_ms: composeBudget(),
+    glossary_id: glossaryId,
+    glossary_version: glossaryVersion
+  });
+}
+
+export async function runJargonDetectionBatchProxy({ texts, glossary, glossaryId, glossaryVersion }) {
+  return postToJargonService("/detect-jargon/batch", {
+    texts,
+    glossary,
+    glossary_id: glossaryId,
+    glossary_version: glossaryVersion
+  });
+}
+
+export async function runJargonDetectionIncrementalProxy({ sessionId, text, glossary, glossaryId, glossaryVersion }) {
+  return postToJargonService("/detect-jargon/incremental", {
+    session_id: sessionId,
+    text,
+    glossary,
+    latency_budget_ms: composeBudget(),
+    glossary_id: glossaryId,
+    glossary_version: glossaryVersion
+  });
+}
+
+export async function runLocalRewriteProxy({ text, audience, tone, glossary, glossaryId, glossaryVersion }) {
+  return postToJargonService("/rewrite", {
+    text,
+    audience,
+    tone,
+    glossary,
+    glossary_id: glossaryId,
+    glossary_version: glossaryVersion
+  });
+}
@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { EditorContent, useEditor } from "@tiptap/react";
 import StarterKit from "@tiptap/starter-kit";
 import { apiFetch } from "../api";
@@ -40,6 +40,8 @@ export default function Composer({ onSend }) {
   const [glossary, setGlossary] = useState([]);
   const [jargonSpans, setJargonSpans] = useState([]);
   const [isDetecting, setIsDetecting] = useState(false);
+  // Identifies the draft so the service only rescores sentences that changed
+  const draftId = useRef(crypto.randomUUID());
 
   const editor = useEditor({
     extensions: [StarterKit.configure({ 
@@ -88,10 +90,10 @@ export default function Composer({ onSend }) {
 
       try {
         setIsDetecting(true);
-        const { jargon_spans, jargon_score } = await apiFetch("/ml/detect-jargon", { 
+        const { jargon_spans, jargon_score } = await apiFetch("/ml/detect-jargon/incremental", { 
           method: "POST", 
           token, 
-          body: { text, glossary }
+          body: { text, sessionId: draftId.current }
         });
         
         // Update jargon spans in state
@@ -138,6 +140,7 @@ export default function Composer({ onSend }) {
         jargonSpans: jargonSpans
       });
       editor.commands.clearContent();
+      draftId.current = crypto.randomUUID();
       setRewritten("");
       setBanner("");
       setJargonSpans([]);